@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytz
+
+
+logger = logging.getLogger(__name__)
+
+HOURS = 24
+# Weibo accounts post on Beijing time
+TZ = pytz.timezone('Asia/Shanghai')
+
+
+class AccountCadence:
+    """Learned posting rate of one account.
+
+    rate is an exponentially weighted Poisson rate (posts per hour) where
+    older observations fade with half_life; hourly holds decayed post
+    counts per hour of the day, giving the time-of-day profile.
+    """
+
+    def __init__(self, rate: float = 0.0, hourly: Optional[List[float]] = None,
+                 last_post_at: float = 0.0, updated_at: float = 0.0):
+        self.rate = rate
+        self.hourly = list(hourly) if hourly and len(hourly) == HOURS else [0.0] * HOURS
+        self.last_post_at = last_post_at
+        self.updated_at = updated_at
+
+    def _decay(self, seconds: float, half_life: float) -> float:
+        return 0.5 ** (max(0.0, seconds) / half_life)
+
+    def observe(self, new_posts: Iterable[float], page_posts: Iterable[float], now: float, half_life: float):
+        """Fold one poll into the estimate.
+
+        new_posts are timestamps of posts not seen before; page_posts are all
+        timestamps on the fetched page and only seed an account with no history.
+        """
+        new_posts = sorted(t for t in new_posts if t and t <= now)
+        if not self.updated_at:
+            page_posts = sorted(t for t in page_posts if t and t <= now)
+            if len(page_posts) >= 2 and page_posts[-1] > page_posts[0]:
+                self.rate = (len(page_posts) - 1) / ((page_posts[-1] - page_posts[0]) / 3600)
+            for t in page_posts:
+                self.hourly[datetime.fromtimestamp(t, TZ).hour] += 1
+            if page_posts:
+                self.last_post_at = page_posts[-1]
+            self.updated_at = now
+            return
+        elapsed = now - self.updated_at
+        if elapsed <= 0:
+            return
+        # Time-weighted EWMA: a long gap moves the estimate more than a short one
+        alpha = 1 - self._decay(elapsed, half_life)
+        sample = len(new_posts) / (elapsed / 3600)
+        self.rate += alpha * (sample - self.rate)
+        factor = self._decay(elapsed, half_life)
+        self.hourly = [count * factor for count in self.hourly]
+        for t in new_posts:
+            self.hourly[datetime.fromtimestamp(t, TZ).hour] += 1
+        if new_posts:
+            self.last_post_at = max(self.last_post_at, new_posts[-1])
+        self.updated_at = now
+
+    def expected_rate(self, now: float) -> float:
+        """Posts per hour expected around now, scaled by the hour-of-day profile"""
+        total = sum(self.hourly)
+        if total <= 0:
+            return self.rate
+        # One pseudo-count per hour keeps empty hours from dropping to zero
+        share = (self.hourly[datetime.fromtimestamp(now, TZ).hour] + 1) / ((total + HOURS) / HOURS)
+        return self.rate * share
+
+    def poll_interval(self, now: float, bounds: Tuple[float, float], posts_per_poll: float, spread: float) -> float:
+        """Seconds until the next poll: aim for posts_per_poll expected posts, within bounds"""
+        low, high = bounds
+        rate = self.expected_rate(now)
+        interval = high if rate <= 0 else posts_per_poll / rate * 3600
+        interval = min(high, max(low, interval))
+        # Spread accounts with similar cadence so they do not poll in lockstep
+        return interval * random.uniform(1 - spread, 1 + spread)
+
+    def to_row(self) -> Tuple[float, str, float, float]:
+        return self.rate, json.dumps([round(c, 4) for c in self.hourly]), self.last_post_at, self.updated_at
+
+    @classmethod
+    def from_row(cls, rate: float, hourly: str, last_post_at: float, updated_at: float) -> "AccountCadence":
+        try:
+            hours = json.loads(hourly or '[]')
+        except Exception:
+            hours = None
+        return cls(rate or 0.0, hours, last_post_at or 0.0, updated_at or 0.0)
+
+
+class CadenceTracker:
+    """Per-account cadence estimates persisted through DatabaseManager"""
+
+    def __init__(self, db_manager, half_life_hours: float, posts_per_poll: float, spread: float = 0.1):
+        self.db_manager = db_manager
+        self.half_life = half_life_hours * 3600
+        self.posts_per_poll = posts_per_poll
+        self.spread = spread
+        self.accounts: Dict[str, AccountCadence] = {
+            account: AccountCadence.from_row(*row) for account, row in db_manager.load_cadence().items()
+        }
+
+    def observe(self, account: str, new_posts: Iterable[float], page_posts: Iterable[float]):
+        cadence = self.accounts.setdefault(account, AccountCadence())
+        cadence.observe(list(new_posts), list(page_posts), time.time(), self.half_life)
+        self.db_manager.save_cadence(account, *cadence.to_row())
+
+    def interval(self, account: str, bounds: Tuple[float, float], default: float) -> float:
+        """Next poll interval in seconds; unknown accounts poll every default (within bounds) until learned"""
+        cadence = self.accounts.get(account)
+        if cadence is None or not cadence.updated_at:
+            return min(bounds[1], max(bounds[0], default))
+        return cadence.poll_interval(time.time(), bounds, self.posts_per_poll, self.spread)
+
+    def summary(self) -> Dict[str, float]:
+        """Posts per day per account, for the status log"""
+        return {account: round(c.rate * 24, 2) for account, c in self.accounts.items() if c.updated_at}
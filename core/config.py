@@ -21,9 +21,19 @@ def load_config() -> Dict[str, Any]:
         for account_name, account_config in config['weibo'].items():
             if 'message_webhook' not in account_config:
                 raise ValueError(f"Missing message_webhook for account {account_name}")
-            webhook_url = account_config['message_webhook']
-            if not webhook_url.startswith('https://discord.com/api/webhooks/'):
-                raise ValueError(f"Invalid Discord webhook URL for account {account_name}")
+            # One webhook URL or a list of them; each gets its own copy of every post
+            webhook_urls = account_config['message_webhook']
+            if isinstance(webhook_urls, str):
+                webhook_urls = [webhook_urls]
+            if not isinstance(webhook_urls, list) or not webhook_urls:
+                raise ValueError(f"message_webhook for account {account_name} must be a URL or a list of URLs")
+            for webhook_url in webhook_urls:
+                if not isinstance(webhook_url, str) or not webhook_url.startswith('https://discord.com/api/webhooks/'):
+                    raise ValueError(f"Invalid Discord webhook URL for account {account_name}")
+            for key in ('poll_min_minutes', 'poll_max_minutes'):
+                value = account_config.get(key)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                    raise ValueError(f"{key} for account {account_name} must be a positive number")
 
         if 'message_webhook' not in config['status']:
             raise ValueError("Missing status message_webhook in config.toml")
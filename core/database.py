@@ -2,14 +2,177 @@ from __future__ import annotations
 
 import sqlite3
 import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from core import settings
+from core.migrations import migrate
 
 
 logger = logging.getLogger(__name__)
 
 
+def _to_timestamp(value: float | None) -> str | None:
+    """Unix time to SQLite's CURRENT_TIMESTAMP format (UTC)"""
+    if not value:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class _Writer:
+    """The only connection that writes, owned by one thread.
+
+    Callers queue functions of the connection; the thread drains whatever
+    is queued and commits it as one transaction (group commit), with a
+    SAVEPOINT per job so one failing job does not undo the others.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path: str, batch_max: int):
+        self.db_path = db_path
+        self.batch_max = max(1, batch_max)
+        self.jobs: queue.Queue = queue.Queue()
+        self.commits = 0
+        self.jobs_done = 0
+        self.commit_ms: deque = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._dead: Optional[str] = None
+        self._inflight: List[Tuple[Callable, Future]] = []
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._dead is not None:
+                future.set_exception(RuntimeError(f'Database writer is not running: {self._dead}'))
+                return future
+            self.jobs.put((fn, future))
+        return future
+
+    def _run(self):
+        reason = 'closed'
+        try:
+            self._serve()
+        except Exception as e:
+            reason = f'writer thread crashed: {e}'
+            logger.error(f'Database {reason}')
+        finally:
+            # Nobody will run what is still queued; fail it instead of leaving callers blocked
+            with self._lock:
+                self._dead = reason
+            leftover = list(self._inflight)
+            while True:
+                try:
+                    leftover.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            for job in leftover:
+                if job is not self._STOP and not job[1].done():
+                    job[1].set_exception(RuntimeError(f'Database writer is not running: {reason}'))
+
+    def _serve(self):
+        connection = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, cached_statements=256)
+        connection.execute('PRAGMA foreign_keys = ON')
+        # WAL + NORMAL only syncs on checkpoints instead of on every commit
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA temp_store = MEMORY')
+        stopping = False
+        while not stopping:
+            batch = [self.jobs.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if self._STOP in batch:
+                stopping = True
+                batch = [job for job in batch if job is not self._STOP]
+            if batch:
+                self._inflight = batch
+                self._commit(connection, batch)
+                self._inflight = []
+        connection.close()
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[Tuple[Callable, Future]]):
+        started = time.monotonic()
+        results = []
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                connection.execute('SAVEPOINT job')
+                try:
+                    results.append((future, fn(connection), None))
+                    connection.execute('RELEASE job')
+                except Exception as e:
+                    connection.execute('ROLLBACK TO job')
+                    connection.execute('RELEASE job')
+                    results.append((future, None, e))
+            connection.execute('COMMIT')
+        except Exception as e:
+            logger.error(f'Database commit failed for {len(batch)} jobs: {e}')
+            try:
+                connection.execute('ROLLBACK')
+            except Exception:
+                pass
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.jobs_done += len(batch)
+        self.commit_ms.append((time.monotonic() - started) * 1000)
+        # Only report back once the batch is durable
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self, timeout: float = 10.0):
+        self.jobs.put(self._STOP)
+        self._thread.join(timeout)
+
+
+class _ReaderPool:
+    """A few read-only connections shared by any thread"""
+
+    def __init__(self, db_path: str, size: int):
+        uri = f'{Path(db_path).as_uri()}?mode=ro'
+        self.connections: queue.Queue = queue.Queue()
+        self._all = []
+        for _ in range(max(1, size)):
+            connection = sqlite3.connect(uri, uri=True, timeout=30.0, check_same_thread=False, cached_statements=256)
+            connection.execute('PRAGMA temp_store = MEMORY')
+            self._all.append(connection)
+            self.connections.put(connection)
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        connection = self.connections.get()
+        try:
+            return fn(connection)
+        finally:
+            self.connections.put(connection)
+
+    def close(self):
+        for connection in self._all:
+            connection.close()
+
+
 class DatabaseManager:
+    """SQLite store safe to use from any thread.
+
+    Writes go through a single writer thread with group commit; lookups use
+    a small pool of read-only connections (WAL lets them run alongside the
+    writer).
+    """
+
     def __init__(self, db_path: str | None = None):
         if db_path is None:
             db_path = Path('data') / 'weibo.db'
@@ -18,73 +181,160 @@ class DatabaseManager:
         if not str(db_path).startswith(str(Path.cwd().resolve())):
             raise ValueError('Database path must be within current working directory')
         self.db_path = str(db_path)
-        self.connection = None
-        self.cursor = None
+        self._writer: Optional[_Writer] = None
+        self._readers: Optional[_ReaderPool] = None
         self._initialize_database()
 
     def _initialize_database(self):
-        self.connection = sqlite3.connect(self.db_path, timeout=30.0)
-        self.connection.execute('PRAGMA foreign_keys = ON')
-        self.connection.execute('PRAGMA journal_mode = WAL')
-        self.cursor = self.connection.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weibo (
-                id INTEGER PRIMARY KEY,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        self.cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_weibo_id ON weibo(id)
-        ''')
-        try:
-            self.cursor.execute('PRAGMA table_info(weibo)')
-            cols = [row[1] for row in self.cursor.fetchall()]
-            if 'processed_at' not in cols:
-                self.cursor.execute('ALTER TABLE weibo ADD COLUMN processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
-        except Exception:
-            pass
-        self.connection.commit()
+        connection = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            connection.execute('PRAGMA journal_mode = WAL')
+            migrate(connection)
+            rows = connection.execute('SELECT account, max_id FROM account_watermark').fetchall()
+        finally:
+            connection.close()
+        # Highest id per account below which every post has been handled
+        self.watermarks: Dict[str, int] = {row[0]: row[1] for row in rows}
+        # Ids near each watermark already found in the database, so rechecking them costs no query
+        self._known_below: Dict[str, set] = {}
+        self._writer = _Writer(self.db_path, settings.DB_WRITE_BATCH_MAX)
+        self._readers = _ReaderPool(self.db_path, settings.DB_READER_POOL_SIZE)
         logger.info(f'Database initialized: {self.db_path}')
 
+    def _write(self, fn: Callable[[sqlite3.Connection], Any], wait: bool = True) -> Any:
+        future = self._writer.submit(fn)
+        return future.result() if wait else future
+
+    def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return self._readers.run(fn)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Writer queue depth and commit latency, for the status log"""
+        latencies = sorted(self._writer.commit_ms)
+        return {
+            'queue_depth': self._writer.jobs.qsize(),
+            'commits': self._writer.commits,
+            'jobs': self._writer.jobs_done,
+            'commit_ms_p50': round(latencies[len(latencies) // 2], 2) if latencies else 0.0,
+            'commit_ms_max': round(latencies[-1], 2) if latencies else 0.0,
+        }
+
     def check_and_add_id(self, weibo_id: int) -> bool:
-        try:
-            if not isinstance(weibo_id, int) or weibo_id <= 0:
-                return False
-            self.cursor.execute('SELECT id FROM weibo WHERE id = ?', (weibo_id,))
-            if self.cursor.fetchone() is None:
-                try:
-                    self.cursor.execute('INSERT INTO weibo (id, processed_at) VALUES (?, CURRENT_TIMESTAMP)', (weibo_id,))
-                except sqlite3.OperationalError:
-                    self.cursor.execute('INSERT INTO weibo (id) VALUES (?)', (weibo_id,))
-                self.connection.commit()
-                return True
+        if not isinstance(weibo_id, int) or weibo_id <= 0:
             return False
+        try:
+            return self._write(lambda c: c.execute(
+                'INSERT OR IGNORE INTO weibo (id, processed_at) VALUES (?, CURRENT_TIMESTAMP)', (weibo_id,)).rowcount == 1)
         except Exception as e:
             logger.error(f'Database operation error: {e}')
             return False
 
+    def get_existing_ids(self, weibo_ids, account: str | None = None) -> set:
+        """Return the subset of weibo_ids already processed or queued for delivery (one query per 500 ids).
+
+        With account given only that account's posts (and ones recorded
+        without an account) count; otherwise any account's do.
+        """
+        ids = [i for i in weibo_ids if isinstance(i, int) and i > 0]
+
+        def lookup(connection: sqlite3.Connection) -> set:
+            existing = set()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                if account:
+                    rows = connection.execute(
+                        f"SELECT id FROM weibo WHERE account IN (?, '') AND id IN ({placeholders}) "
+                        f'UNION SELECT weibo_id FROM outbox WHERE account = ? AND weibo_id IN ({placeholders})',
+                        [account, *chunk, account, *chunk])
+                else:
+                    rows = connection.execute(
+                        f'SELECT id FROM weibo WHERE id IN ({placeholders}) '
+                        f'UNION SELECT weibo_id FROM outbox WHERE weibo_id IN ({placeholders})', chunk * 2)
+                existing.update(row[0] for row in rows)
+            return existing
+
+        try:
+            return self._read(lookup)
+        except Exception as e:
+            logger.error(f'Database lookup error: {e}')
+            return set()
+
+    def filter_new_ids(self, weibo_ids, account: str | None = None) -> set:
+        """Return the ids from weibo_ids that have not been processed yet.
+
+        With account given, ids above its watermark are looked up, and so
+        are the WATERMARK_RECHECK_IDS highest ids at or below it: pinned,
+        deleted or delayed posts can show up out of id order. Older ids are
+        rejected from memory, and band ids already found once are
+        remembered, so a scan with nothing new does no database I/O.
+        """
+        ids = {i for i in weibo_ids if isinstance(i, int) and i > 0}
+        mark = self.watermarks.get(account) if account else None
+        if mark is not None:
+            band = sorted((i for i in ids if i <= mark), reverse=True)[:settings.WATERMARK_RECHECK_IDS]
+            known = self._known_below.get(account, set())
+            ids = {i for i in ids if i > mark}.union(i for i in band if i not in known)
+        if not ids:
+            return set()
+        existing = self.get_existing_ids(ids, account=account)
+        if mark is not None:
+            known = self._known_below.get(account, set()) | {i for i in existing if i <= mark}
+            self._known_below[account] = set(sorted(known, reverse=True)[:settings.WATERMARK_RECHECK_IDS * 2])
+        return ids - existing
+
+    def mark_processed(self, weibo_ids, account: str | None = None, watermark: int | None = None,
+                       posted_at: Dict[int, float] | None = None) -> int:
+        """Record ids as processed and raise the account's watermark, in one transaction.
+
+        posted_at optionally maps ids to the post's Unix timestamp. Returns how
+        many ids were new.
+        """
+        posted_at = posted_at or {}
+        ids = [(i, account or '', _to_timestamp(posted_at.get(i))) for i in set(weibo_ids) if isinstance(i, int) and i > 0]
+        advance = bool(account) and watermark is not None and watermark > self.watermarks.get(account, 0)
+        if not ids and not advance:
+            return 0
+
+        def write(connection: sqlite3.Connection) -> int:
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO weibo (id, processed_at, account, posted_at) '
+                'VALUES (?, CURRENT_TIMESTAMP, ?, ?)', ids)
+            added = connection.total_changes - before
+            if advance:
+                connection.execute(
+                    'INSERT OR REPLACE INTO account_watermark (account, max_id, updated_at) '
+                    'VALUES (?, ?, CURRENT_TIMESTAMP)', (account, watermark))
+            return added
+
+        try:
+            added = self._write(write)
+        except Exception as e:
+            logger.error(f'Error marking IDs as processed: {e}')
+            return 0
+        if advance:
+            self.watermarks[account] = watermark
+        return added
+
     def add_all_ids(self, weibo_items: List[Dict[str, Any]]):
+        valid_ids = []
+        for item in weibo_items:
+            if isinstance(item, dict) and 'id' in item and isinstance(item['id'], int) and item['id'] > 0:
+                valid_ids.append(item['id'])
+        if not valid_ids:
+            return
         try:
-            valid_ids = []
-            for item in weibo_items:
-                if isinstance(item, dict) and 'id' in item and isinstance(item['id'], int) and item['id'] > 0:
-                    valid_ids.append(item['id'])
-            if valid_ids:
-                try:
-                    self.cursor.executemany('INSERT OR IGNORE INTO weibo (id, processed_at) VALUES (?, CURRENT_TIMESTAMP)', [(i,) for i in valid_ids])
-                except sqlite3.OperationalError:
-                    self.cursor.executemany('INSERT OR IGNORE INTO weibo (id) VALUES (?)', [(i,) for i in valid_ids])
-                self.connection.commit()
-                logger.info(f'Added {len(valid_ids)} weibo IDs to database')
+            self._write(lambda c: c.executemany(
+                'INSERT OR IGNORE INTO weibo (id, processed_at) VALUES (?, CURRENT_TIMESTAMP)', [(i,) for i in valid_ids]))
+            logger.info(f'Added {len(valid_ids)} weibo IDs to database')
         except Exception as e:
             logger.error(f'Error adding IDs to database: {e}')
 
     def cleanup_old_records(self, days: int = 30):
         try:
-            self.cursor.execute("DELETE FROM weibo WHERE processed_at < datetime('now', ? || ' days')", (f'-{int(days)}',))
-            deleted_count = self.cursor.rowcount
-            self.connection.commit()
+            deleted_count = self._write(lambda c: c.execute(
+                "DELETE FROM weibo WHERE processed_at < datetime('now', ? || ' days')", (f'-{int(days)}',)).rowcount)
             if deleted_count > 0:
                 logger.info(f'Cleaned up {deleted_count} old records')
         except Exception as e:
@@ -92,20 +342,114 @@ class DatabaseManager:
 
     def get_recent_ids(self, limit: int = 100) -> List[int]:
         try:
-            self.cursor.execute('SELECT id FROM weibo ORDER BY processed_at DESC LIMIT ?', (int(limit),))
-            return [row[0] for row in self.cursor.fetchall()]
+            return self._read(lambda c: [row[0] for row in c.execute(
+                'SELECT id FROM weibo ORDER BY processed_at DESC LIMIT ?', (int(limit),))])
         except Exception as e:
             logger.error(f'Error getting recent IDs: {e}')
             return []
 
+    def enqueue_outbox(self, rows: List[Tuple[int, str, str, str, str, float | None]]) -> int:
+        """Queue rendered messages in one transaction.
+
+        rows are (weibo_id, account, webhook_url, payload JSON, files JSON,
+        posted_at Unix time); they are delivered in insertion order.
+        """
+        if not rows:
+            return 0
+        values = [(w, a, url, payload, files, _to_timestamp(posted)) for w, a, url, payload, files, posted in rows]
+        try:
+            return self._write(lambda c: c.executemany(
+                'INSERT INTO outbox (weibo_id, account, webhook_url, payload, files, posted_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', values).rowcount)
+        except Exception as e:
+            logger.error(f'Error queueing messages for delivery: {e}')
+            return 0
+
+    def pending_outbox(self, per_webhook: int = 50) -> List[Dict[str, Any]]:
+        """Oldest pending messages first, at most per_webhook for each webhook.
+
+        Limiting per webhook keeps a long backlog on one destination (say
+        one that is backing off) from hiding every other destination's queue.
+        """
+        columns = ('id', 'weibo_id', 'account', 'webhook_url', 'payload', 'files', 'attempts', 'next_attempt_at')
+        names = ', '.join(columns)
+        try:
+            return self._read(lambda c: [dict(zip(columns, row)) for row in c.execute(
+                f"SELECT {names} FROM (SELECT {names}, ROW_NUMBER() OVER (PARTITION BY webhook_url ORDER BY id) AS n "
+                f"FROM outbox WHERE state = 'pending') WHERE n <= ? ORDER BY id", (int(per_webhook),))])
+        except Exception as e:
+            logger.error(f'Error reading delivery outbox: {e}')
+            return []
+
+    def retry_outbox(self, row_id: int, error: str, next_attempt_at: float, count_attempt: bool = True):
+        """Push a message back; rate-limit waits pass count_attempt=False so they do not grow its backoff"""
+        self._write(lambda c: c.execute(
+            'UPDATE outbox SET attempts = attempts + ?, last_error = ?, next_attempt_at = ? WHERE id = ?',
+            (1 if count_attempt else 0, error, next_attempt_at, row_id)))
+
+    def finish_outbox(self, row_id: int, delivered: bool, error: str | None = None):
+        """Close a message; once a post has no pending messages left it is marked processed.
+
+        delivered=False is only for messages Discord rejected for good;
+        transient failures go through retry_outbox and stay pending.
+        """
+        def write(connection: sqlite3.Connection):
+            connection.execute(
+                "UPDATE outbox SET state = ?, attempts = attempts + 1, last_error = ?, finished_at = CURRENT_TIMESTAMP "
+                "WHERE id = ?", ('delivered' if delivered else 'failed', error, row_id))
+            weibo_id, account, posted_at = connection.execute(
+                'SELECT weibo_id, account, posted_at FROM outbox WHERE id = ?', (row_id,)).fetchone()
+            pending = connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE weibo_id = ? AND account IS ? AND state = 'pending'",
+                (weibo_id, account)).fetchone()[0]
+            if not pending:
+                connection.execute(
+                    'INSERT OR IGNORE INTO weibo (id, processed_at, account, posted_at) '
+                    'VALUES (?, CURRENT_TIMESTAMP, ?, ?)', (weibo_id, account or '', posted_at))
+
+        self._write(write)
+
+    def cleanup_outbox(self, days: int = 7):
+        """Drop finished messages older than days (their attachments are released on delivery)"""
+        try:
+            deleted_count = self._write(lambda c: c.execute(
+                "DELETE FROM outbox WHERE state != 'pending' AND finished_at < datetime('now', ? || ' days')",
+                (f'-{int(days)}',)).rowcount)
+            if deleted_count > 0:
+                logger.info(f'Cleaned up {deleted_count} delivered outbox messages')
+        except Exception as e:
+            logger.error(f'Error cleaning up delivery outbox: {e}')
+
+    def outbox_counts(self) -> Dict[str, int]:
+        try:
+            return self._read(lambda c: dict(c.execute('SELECT state, COUNT(*) FROM outbox GROUP BY state').fetchall()))
+        except Exception as e:
+            logger.error(f'Error counting delivery outbox: {e}')
+            return {}
+
+    def load_cadence(self) -> Dict[str, Tuple[float, str, float, float]]:
+        """Return {account: (rate, hourly JSON, last_post_at, updated_at)}"""
+        try:
+            return self._read(lambda c: {row[0]: tuple(row[1:]) for row in c.execute(
+                'SELECT account, rate, hourly, last_post_at, updated_at FROM account_cadence')})
+        except Exception as e:
+            logger.error(f'Error loading account cadence: {e}')
+            return {}
+
+    def save_cadence(self, account: str, rate: float, hourly: str, last_post_at: float, updated_at: float):
+        # Nobody waits on this; the writer folds it into the next group commit
+        future = self._write(lambda c: c.execute(
+            'INSERT OR REPLACE INTO account_cadence (account, rate, hourly, last_post_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?)', (account, rate, hourly, last_post_at, updated_at)), wait=False)
+        future.add_done_callback(
+            lambda f: f.exception() and logger.error(f'Error saving account cadence: {f.exception()}'))
+
     def close(self):
         try:
-            if self.cursor:
-                self.cursor.close()
-            if self.connection:
-                self.connection.close()
+            if self._writer:
+                self._writer.close()
+            if self._readers:
+                self._readers.close()
             logger.info('Database connection closed')
         except Exception as e:
             logger.error(f'Error closing database: {e}')
-
-
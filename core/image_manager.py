@@ -1,16 +1,40 @@
 from __future__ import annotations
 
+import os
+import shutil
+import threading
+import time
 import uuid
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from core import settings
+from core.rate_limiter import get_bucket
 
 
 logger = logging.getLogger(__name__)
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Referer': 'https://weibo.com/',
+    'Sec-Fetch-Dest': 'image',
+    'Sec-Fetch-Mode': 'no-cors',
+    'Sec-Fetch-Site': 'cross-site',
+}
+
+
+class _Abandoned(Exception):
+    """A download given up on (bad response, size limit or post deadline); counted as a failure"""
+
 
 class ImageManager:
     def __init__(self, image_dir: Path):
@@ -22,14 +46,25 @@ class ImageManager:
         self.image_dir = image_dir
         self.image_dir.mkdir(exist_ok=True)
         self.should_delete_images = True
+        # Attachments waiting in the delivery outbox live here and survive restarts
+        self.outbox_dir = self.image_dir / 'outbox'
+        self.outbox_dir.mkdir(exist_ok=True)
         self.downloaded_files = set()
+        # One keep-alive session and concurrency cap per image host
+        self._sessions: Dict[str, requests.Session] = {}
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.downloads = 0
+        self.failures = 0
+        self.bytes_downloaded = 0
+        self._latencies_ms = deque(maxlen=200)
         logger.info(f'Image manager initialized: {self.image_dir}')
 
     def _validate_url(self, url: str) -> bool:
         if not isinstance(url, str) or not url.strip():
             return False
         try:
-            from urllib.parse import urlparse
             parsed = urlparse(url)
             if parsed.scheme != 'https':
                 return False
@@ -43,69 +78,138 @@ class ImageManager:
         except Exception:
             return False
 
-    def download_image(self, url: str) -> Optional[Path]:
+    def _host(self, host: str):
+        """Session and concurrency slots for one image host"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                size = settings.IMAGE_PER_HOST_CONCURRENCY
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=size))
+                session.headers.update(HEADERS)
+                self._sessions[host] = session
+                self._host_slots[host] = threading.BoundedSemaphore(size)
+            return session, self._host_slots[host]
+
+    def download_image(self, url: str, deadline: Optional[float] = None) -> Optional[Path]:
+        """Download one image; deadline is a time.monotonic() value after which it is abandoned"""
+        file_path = None
+        started = time.monotonic()
         try:
             if not self._validate_url(url):
                 logger.warning(f'Invalid or unsafe URL: {url}')
-                return None
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Referer': 'https://weibo.com/',
-                'Sec-Fetch-Dest': 'image',
-                'Sec-Fetch-Mode': 'no-cors',
-                'Sec-Fetch-Site': 'cross-site',
-            }
-            response = requests.get(url, headers=headers, timeout=settings.REQUEST_TIMEOUT_SECONDS, stream=True)
-            if response.status_code != 200:
-                logger.warning(f'HTTP {response.status_code} for URL: {url}')
-                return None
-            content_type = response.headers.get('content-type', '').lower()
-            if not content_type.startswith('image/'):
-                logger.warning(f'Invalid content type: {content_type} for URL: {url}')
-                return None
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > settings.IMAGE_MAX_DOWNLOAD_BYTES:
-                logger.warning(f'File too large: {content_length} bytes for URL: {url}')
-                return None
-            file_extension = Path(url).suffix or '.jpg'
-            file_name = f"{uuid.uuid4()}{file_extension}"
-            file_path = self.image_dir / file_name
-            downloaded_size = 0
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        downloaded_size += len(chunk)
-                        if downloaded_size > settings.IMAGE_MAX_DOWNLOAD_BYTES:
-                            f.close()
-                            file_path.unlink(missing_ok=True)
-                            logger.warning(f'File exceeded size limit during download: {url}')
-                            return None
-                        f.write(chunk)
-            self.downloaded_files.add(file_path)
+                raise _Abandoned()
+            session, slots = self._host(urlparse(url).netloc)
+            if not slots.acquire(timeout=max(0.0, deadline - time.monotonic()) if deadline else None):
+                logger.warning(f'Post image deadline passed before download started: {url}')
+                raise _Abandoned()
+            try:
+                get_bucket('sinaimg', settings.IMAGE_RATE_LIMIT_MAX_REQUESTS, settings.IMAGE_RATE_LIMIT_TIME_WINDOW).wait_if_needed()
+                timeout = settings.REQUEST_TIMEOUT_SECONDS
+                if deadline:
+                    timeout = max(1.0, min(timeout, deadline - time.monotonic()))
+                response = session.get(url, timeout=timeout, stream=True)
+                with response:
+                    if response.status_code != 200:
+                        logger.warning(f'HTTP {response.status_code} for URL: {url}')
+                        raise _Abandoned()
+                    content_type = response.headers.get('content-type', '').lower()
+                    if not content_type.startswith('image/'):
+                        logger.warning(f'Invalid content type: {content_type} for URL: {url}')
+                        raise _Abandoned()
+                    content_length = response.headers.get('content-length')
+                    if content_length and int(content_length) > settings.IMAGE_MAX_DOWNLOAD_BYTES:
+                        logger.warning(f'File too large: {content_length} bytes for URL: {url}')
+                        raise _Abandoned()
+                    file_extension = Path(url).suffix or '.jpg'
+                    file_path = self.image_dir / f"{uuid.uuid4()}{file_extension}"
+                    downloaded_size = 0
+                    with open(file_path, 'wb', buffering=settings.IMAGE_DOWNLOAD_CHUNK_BYTES) as f:
+                        for chunk in response.iter_content(chunk_size=settings.IMAGE_DOWNLOAD_CHUNK_BYTES):
+                            if not chunk:
+                                continue
+                            downloaded_size += len(chunk)
+                            if downloaded_size > settings.IMAGE_MAX_DOWNLOAD_BYTES:
+                                logger.warning(f'File exceeded size limit during download: {url}')
+                                raise _Abandoned()
+                            if deadline and time.monotonic() > deadline:
+                                logger.warning(f'Post image deadline passed during download: {url}')
+                                raise _Abandoned()
+                            f.write(chunk)
+            finally:
+                slots.release()
+            with self._lock:
+                self.downloaded_files.add(file_path)
+                self.downloads += 1
+                self.bytes_downloaded += downloaded_size
+                self._latencies_ms.append((time.monotonic() - started) * 1000)
             logger.debug(f'Downloaded image: {file_path.name} ({downloaded_size} bytes)')
             return file_path
+        except _Abandoned:
+            pass
         except requests.RequestException as e:
             logger.error(f'Request error downloading image {url}: {e}')
-            return None
         except Exception as e:
             logger.error(f'Error downloading image {url}: {e}')
-            return None
+        if file_path is not None:
+            file_path.unlink(missing_ok=True)
+        with self._lock:
+            self.failures += 1
+        return None
 
     def download_images(self, urls: List[str]) -> List[Path]:
-        downloaded_images = []
+        """Download a post's images in parallel, in the order given.
+
+        Images still missing when IMAGE_POST_DEADLINE_SECONDS runs out are
+        left out, so one slow image cannot hold up the post.
+        """
+        valid_urls = []
         for url in urls:
             if not isinstance(url, str):
                 logger.warning(f'Invalid URL type: {type(url)}')
                 continue
-            image_path = self.download_image(url)
-            if image_path:
-                downloaded_images.append(image_path)
+            valid_urls.append(url)
+        if not valid_urls:
+            return []
+        deadline = time.monotonic() + settings.IMAGE_POST_DEADLINE_SECONDS
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=settings.IMAGE_DOWNLOAD_WORKERS,
+                                                thread_name_prefix='image-download')
+        futures = [self._pool.submit(self.download_image, url, deadline) for url in valid_urls]
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in pending:
+            future.cancel()
+        downloaded_images = [f.result() for f in futures if f in done and f.result()]
+        if pending:
+            logger.warning(f'{len(pending)} image(s) missed the {settings.IMAGE_POST_DEADLINE_SECONDS}s post deadline')
         logger.info(f'Downloaded {len(downloaded_images)}/{len(urls)} images')
         return downloaded_images
 
+    def stats(self) -> Dict[str, Any]:
+        """Download counters and latency, for the status log"""
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            return {
+                'downloads': self.downloads,
+                'failures': self.failures,
+                'bytes': self.bytes_downloaded,
+                'latency_ms_p50': round(latencies[len(latencies) // 2], 1) if latencies else 0.0,
+                'latency_ms_max': round(latencies[-1], 1) if latencies else 0.0,
+            }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
     def delete_images(self, file_paths: List[Path]):
         deleted_count = 0
         for file_path in file_paths:
@@ -124,6 +228,40 @@ class ImageManager:
         if deleted_count > 0:
             logger.debug(f'Deleted {deleted_count} image files')
 
+    def retain(self, file_paths: List[Path]) -> List[Path]:
+        """Keep copies of files for the delivery outbox, out of reach of cleanup_all.
+
+        Each file gets its own directory under outbox/ so its name (which
+        embeds reference as attachment://name) is unchanged.
+        """
+        retained = []
+        for file_path in file_paths:
+            path = Path(file_path)
+            target = self.outbox_dir / uuid.uuid4().hex[:16] / path.name
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copy2(path, target)
+                retained.append(target)
+            except Exception as e:
+                logger.error(f'Error retaining {path} for delivery: {e}')
+        return retained
+
+    def release(self, file_paths: List[Path]):
+        """Delete outbox copies made by retain()"""
+        for file_path in file_paths:
+            path = Path(file_path)
+            try:
+                if not str(path.resolve()).startswith(str(self.outbox_dir.resolve())):
+                    logger.warning(f'Attempted to release file outside outbox directory: {path}')
+                    continue
+                path.unlink(missing_ok=True)
+                path.parent.rmdir()
+            except Exception as e:
+                logger.debug(f'Error releasing {path}: {e}')
+
     def cleanup_all(self):
         try:
             for file_path in list(self.downloaded_files):
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from typing import Callable, List, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _add_column(cursor: sqlite3.Cursor, table: str, column: str, decl: str):
+    # Databases created by older versions may already have the column
+    if column not in _columns(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+
+def _baseline(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weibo (
+            id INTEGER PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # SQLite cannot ALTER in a CURRENT_TIMESTAMP default, so backfill old rows instead
+    _add_column(cursor, 'weibo', 'processed_at', 'TIMESTAMP')
+    cursor.execute('UPDATE weibo SET processed_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE processed_at IS NULL')
+
+
+def _fix_indexes(cursor: sqlite3.Cursor):
+    # id is the INTEGER PRIMARY KEY (the rowid); a second index on it only slows inserts
+    cursor.execute('DROP INDEX IF EXISTS idx_weibo_id')
+    # Retention deletes and recent-id lookups filter and sort on processed_at
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_weibo_processed_at ON weibo(processed_at)')
+
+
+def _account_columns(cursor: sqlite3.Cursor):
+    _add_column(cursor, 'weibo', 'account', 'TEXT')
+    _add_column(cursor, 'weibo', 'posted_at', 'TIMESTAMP')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_weibo_account_id ON weibo(account, id)')
+
+
+def _account_tables(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS account_watermark (
+            account TEXT PRIMARY KEY,
+            max_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS account_cadence (
+            account TEXT PRIMARY KEY,
+            rate REAL NOT NULL DEFAULT 0,
+            hourly TEXT,
+            last_post_at REAL,
+            updated_at REAL
+        )
+    ''')
+
+
+def _outbox(cursor: sqlite3.Cursor):
+    # One row per Discord message; a post may need several (e.g. collage + GIFs)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            weibo_id INTEGER NOT NULL,
+            account TEXT,
+            webhook_url TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            files TEXT NOT NULL DEFAULT '[]',
+            posted_at TIMESTAMP,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox(state, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_weibo_id ON outbox(weibo_id)')
+
+
+def _per_account_dedup(cursor: sqlite3.Cursor):
+    # Several accounts can follow one UID, so a post is processed per account.
+    # account '' marks rows from before this (or written without an account);
+    # they count as processed for every account.
+    cursor.execute('''
+        CREATE TABLE weibo_new (
+            id INTEGER NOT NULL,
+            account TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            posted_at TIMESTAMP,
+            PRIMARY KEY (account, id)
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO weibo_new (id, account, created_at, processed_at, posted_at) "
+                   "SELECT id, COALESCE(account, ''), created_at, processed_at, posted_at FROM weibo")
+    cursor.execute('DROP TABLE weibo')
+    cursor.execute('ALTER TABLE weibo_new RENAME TO weibo')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_weibo_processed_at ON weibo(processed_at)')
+    # id is no longer the rowid; lookups across all accounts need their own index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_weibo_id ON weibo(id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_account_weibo_id ON outbox(account, weibo_id)')
+
+
+# (version, description, step). Append only; never edit a released step.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, 'baseline weibo table', _baseline),
+    (2, 'drop redundant id index, index processed_at', _fix_indexes),
+    (3, 'account and posted_at columns', _account_columns),
+    (4, 'account watermark and cadence tables', _account_tables),
+    (5, 'delivery outbox', _outbox),
+    (6, 'deduplicate posts per account', _per_account_dedup),
+]
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Bring the schema up to the latest version tracked in PRAGMA user_version.
+
+    Each step runs in its own transaction together with the version bump,
+    so an interrupted upgrade resumes from the last completed step.
+    Returns the resulting version.
+    """
+    cursor = connection.cursor()
+    try:
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for target, description, step in MIGRATIONS:
+            if target <= version:
+                continue
+            cursor.execute('BEGIN')
+            try:
+                step(cursor)
+                cursor.execute(f'PRAGMA user_version = {int(target)}')
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            logger.info(f'Database migrated to version {target}: {description}')
+            version = target
+        return version
+    finally:
+        cursor.close()
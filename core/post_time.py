@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+
+def parse_created_at(value: Any, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Parse the created_at formats Weibo uses (API, mobile DOM and relative "今天/昨天").
+
+    Returns None when the value is not recognised.
+    """
+    s = str(value or '').strip()
+    if now is None:
+        now = datetime.now()
+    dt = None
+    try:
+        dt = datetime.strptime(s, '%a %b %d %H:%M:%S %z %Y')
+    except (ValueError, TypeError):
+        dt = None
+    if dt is None:
+        m = re.match(r'^(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})$', s)
+        if m:
+            month, day, hh, mm = map(int, m.groups())
+            dt = now.replace(month=month, day=day, hour=hh, minute=mm, second=0, microsecond=0)
+    if dt is None:
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+            try:
+                dt = datetime.strptime(s, fmt)
+                break
+            except Exception:
+                pass
+    if dt is None:
+        m = re.match(r'^昨天\s+(\d{1,2}):(\d{2})$', s)
+        if m:
+            hh, mm = map(int, m.groups())
+            dt = (now.replace(hour=hh, minute=mm, second=0, microsecond=0))
+            dt = dt.replace(day=now.day) - timedelta(days=1)
+        else:
+            m = re.match(r'^今天\s+(\d{1,2}):(\d{2})$', s)
+            if m:
+                hh, mm = map(int, m.groups())
+                dt = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    return dt
@@ -1,24 +1,98 @@
 from __future__ import annotations
 
+import asyncio
+import threading
 import time
+from typing import Dict, Optional
 
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 10, time_window: int = 60):
+    """GCRA token bucket: max_requests per time_window, up to burst at once.
+
+    Each acquisition reserves the next free slot and sleeps exactly until it,
+    so waiting callers are served in order without polling. burst defaults
+    to max_requests, which matches the old sliding-window behaviour.
+    """
+
+    def __init__(self, max_requests: int = 10, time_window: float = 60, burst: Optional[int] = None, name: str = ''):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = []
+        self.burst = max(1, burst if burst is not None else max_requests)
+        self.name = name
+        self.interval = time_window / max(1, max_requests)
+        self._tolerance = self.interval * (self.burst - 1)
+        # Theoretical arrival time of the next request (monotonic clock)
+        self._tat = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.max_wait = 0.0
+
+    def _reserve(self, n: int = 1) -> float:
+        """Take the next n slots and return how long to wait for the last of them"""
+        n = max(1, int(n))
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            delay = max(0.0, tat + (n - 1) * self.interval - self._tolerance - now)
+            self._tat = tat + n * self.interval
+            self.requests += n
+            if delay > 0:
+                self.throttled += 1
+                self.throttled_seconds += delay
+                self.max_wait = max(self.max_wait, delay)
+            return delay
 
     def can_proceed(self) -> bool:
-        now = time.time()
-        self.requests = [t for t in self.requests if now - t < self.time_window]
-        if len(self.requests) < self.max_requests:
-            self.requests.append(now)
+        """Take a slot only if one is free right now"""
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            if tat - self._tolerance > now:
+                return False
+            self._tat = tat + self.interval
+            self.requests += 1
             return True
-        return False
 
-    def wait_if_needed(self):
-        while not self.can_proceed():
-            time.sleep(1)
+    def wait_if_needed(self, n: int = 1) -> float:
+        """Block until n slots are free (one per request about to be made); returns the seconds waited"""
+        delay = self._reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire(self, n: int = 1) -> float:
+        """asyncio version of wait_if_needed"""
+        delay = self._reserve(n)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'max_wait_seconds': round(self.max_wait, 3),
+            }
+
+
+_buckets: Dict[str, RateLimiter] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name: str, max_requests: int, time_window: float, burst: Optional[int] = None) -> RateLimiter:
+    """Return the shared limiter called name, creating it on first use"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = RateLimiter(max_requests, time_window, burst=burst, name=name)
+        return bucket
 
 
+def bucket_stats() -> Dict[str, Dict[str, float]]:
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {name: bucket.stats() for name, bucket in buckets.items()}
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """One periodic task with its own deadline, backoff and circuit-breaker state"""
+
+    def __init__(self, name: str, interval: float, fn: Optional[Callable[[], Any]] = None,
+                 group: Optional[str] = None, payload: Any = None):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.group = group
+        self.payload = payload
+        self.next_run = 0.0
+        self.failures = 0
+        self.circuit_open = False
+        self.skipped_runs = 0
+        self._version = 0
+
+
+class Scheduler:
+    """Deadline scheduler backed by a heap of (next_run, seq, version, name).
+
+    A job function returns False to report failure; None or anything truthy
+    counts as success. Failed jobs are re-queued with exponential backoff
+    instead of retrying inline, and after breaker_failures failures in a row
+    the job's circuit opens and it only runs again after breaker_cooldown.
+    Runs missed while the process was busy are coalesced into one.
+
+    Jobs that share a group are handed to the group's handler together,
+    which returns {job name: success}. When one of them comes due, the
+    others due within group_window seconds run with it, so jittered
+    deadlines still form batches.
+    """
+
+    def __init__(self, retry_base: float = 90, retry_max: float = 1800,
+                 breaker_failures: int = 5, breaker_cooldown: float = 3600,
+                 group_window: float = 0.0):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.group_window = group_window
+        self.jobs: Dict[str, Job] = {}
+        self._groups: Dict[str, Callable[[List[Job]], Dict[str, bool]]] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def add_group(self, group: str, handler: Callable[[List[Job]], Dict[str, bool]]):
+        self._groups[group] = handler
+
+    def add_job(self, job: Job, delay: float = 0.0) -> Job:
+        self.jobs[job.name] = job
+        self._push(job, time.monotonic() + delay)
+        return job
+
+    def remove_job(self, name: str):
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            # Stale heap entries are skipped by version
+            job._version += 1
+
+    def reschedule(self, name: str, delay: float):
+        """Move a job's next run to delay seconds from now"""
+        job = self.jobs.get(name)
+        if job is not None:
+            self._push(job, time.monotonic() + delay)
+
+    def _push(self, job: Job, when: float):
+        job._version += 1
+        job.next_run = when
+        heapq.heappush(self._heap, (when, next(self._seq), job._version, job.name))
+        self._wake.set()
+
+    def _pop_due(self, now: float) -> List[Job]:
+        due = []
+        early = []
+        while self._heap and self._heap[0][0] <= now + self.group_window:
+            entry = heapq.heappop(self._heap)
+            job = self.jobs.get(entry[3])
+            if job is None or job._version != entry[2]:
+                continue
+            if entry[0] <= now:
+                due.append(job)
+            else:
+                early.append(entry)
+        # Jobs due soon ride along with a due job of their group; the rest go back
+        ready = {job.group for job in due if job.group in self._groups}
+        for entry in early:
+            job = self.jobs[entry[3]]
+            if job.group in ready:
+                due.append(job)
+            else:
+                heapq.heappush(self._heap, entry)
+        return due
+
+    def seconds_until_next(self) -> Optional[float]:
+        while self._heap:
+            when, _, version, name = self._heap[0]
+            job = self.jobs.get(name)
+            if job is not None and job._version == version:
+                return max(0.0, when - time.monotonic())
+            heapq.heappop(self._heap)
+        return None
+
+    def run_pending(self) -> int:
+        """Run every job that is due; returns how many ran"""
+        now = time.monotonic()
+        due = self._pop_due(now)
+        grouped: Dict[str, List[Job]] = {}
+        for job in due:
+            if job.group in self._groups:
+                grouped.setdefault(job.group, []).append(job)
+                continue
+            try:
+                ok = job.fn() is not False
+            except Exception as e:
+                logger.error(f'Scheduled job {job.name} failed: {e}')
+                ok = False
+            self._finish(job, ok)
+        for group, jobs in grouped.items():
+            try:
+                results = self._groups[group](jobs) or {}
+            except Exception as e:
+                logger.error(f'Scheduled group {group} failed: {e}')
+                results = {}
+            for job in jobs:
+                # Batch members count from the shared start, so their deadlines stay together
+                self._finish(job, results.get(job.name, False), base=now)
+        return len(due)
+
+    def _finish(self, job: Job, ok: bool, base: Optional[float] = None):
+        if job.name not in self.jobs:
+            return
+        now = time.monotonic()
+        if ok:
+            if job.circuit_open:
+                logger.info(f'Circuit closed for {job.name}')
+            job.failures = 0
+            job.circuit_open = False
+            when = (job.next_run if base is None else base) + job.interval
+            if when <= now:
+                # Coalesce every run we missed into the one happening now
+                missed = int((now - when) // job.interval) + 1
+                job.skipped_runs += missed
+                logger.debug(f'{job.name} missed {missed} run(s); coalesced')
+                when = now + job.interval
+            self._push(job, when)
+            return
+        job.failures += 1
+        if job.failures >= self.breaker_failures:
+            if not job.circuit_open:
+                logger.warning(f'Circuit opened for {job.name} after {job.failures} failures; '
+                               f'next try in {self.breaker_cooldown:.0f}s')
+            job.circuit_open = True
+            delay = self.breaker_cooldown
+        else:
+            delay = min(self.retry_base * (2 ** (job.failures - 1)), self.retry_max) * random.uniform(0.8, 1.2)
+            logger.warning(f'{job.name} failed ({job.failures} in a row); retrying in {delay:.0f}s')
+        self._push(job, now + delay)
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def run_forever(self, max_idle: float = 60.0):
+        """Run jobs as they come due, sleeping only until the nearest deadline"""
+        self._stopped = False
+        while not self._stopped:
+            self.run_pending()
+            wait = self.seconds_until_next()
+            wait = max_idle if wait is None else min(wait, max_idle)
+            self._wake.clear()
+            if wait > 0 and not self._stopped:
+                self._wake.wait(wait)
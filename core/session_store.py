@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+
+logger = logging.getLogger(__name__)
+
+# Cookies for these origins make up the Weibo visitor session
+COOKIE_URLS = [
+    'https://m.weibo.cn/',
+    'https://weibo.cn/',
+    'https://weibo.com/',
+    'https://passport.weibo.com/',
+]
+_CDP_COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+
+class SessionStore:
+    """On-disk cookie jar for the Weibo visitor session.
+
+    Loaded into every new driver so restarts and driver recreation start
+    with a warm session instead of renegotiating visitor cookies.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        if path is None:
+            path = Path('data') / 'session_cookies.json'
+        path = Path(path).resolve()
+        if not str(path).startswith(str(Path.cwd().resolve())):
+            raise ValueError('Session store path must be within current working directory')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._last_saved: List[Dict[str, Any]] = []
+
+    def load(self) -> List[Dict[str, Any]]:
+        try:
+            if not self.path.exists():
+                return []
+            cookies = json.loads(self.path.read_text(encoding='utf-8'))
+            if not isinstance(cookies, list):
+                return []
+            now = time.time()
+            return [c for c in cookies if isinstance(c, dict) and c.get('name')
+                    and not (isinstance(c.get('expires'), (int, float)) and 0 < c['expires'] < now)]
+        except Exception as e:
+            logger.warning(f'Failed to load session cookies: {e}')
+            return []
+
+    def save(self, cookies: List[Dict[str, Any]]) -> bool:
+        cookies = [{k: c[k] for k in _CDP_COOKIE_FIELDS if k in c} for c in cookies if c.get('name')]
+        if not cookies or cookies == self._last_saved:
+            return False
+        try:
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(cookies, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(self.path)
+            self._last_saved = cookies
+            logger.debug(f'Saved {len(cookies)} session cookies')
+            return True
+        except Exception as e:
+            logger.warning(f'Failed to save session cookies: {e}')
+            return False
+
+    def wipe(self):
+        try:
+            self.path.unlink(missing_ok=True)
+            self._last_saved = []
+            logger.info('Session cookie store wiped')
+        except Exception as e:
+            logger.warning(f'Failed to wipe session cookies: {e}')
+
+    def load_into_driver(self, driver) -> int:
+        """Install stored cookies via CDP (no navigation needed)."""
+        cookies = []
+        for c in self.load():
+            cookie = {k: c[k] for k in _CDP_COOKIE_FIELDS if k in c}
+            if not isinstance(cookie.get('expires'), (int, float)) or cookie['expires'] <= 0:
+                cookie.pop('expires', None)
+            cookies.append(cookie)
+        if not cookies:
+            return 0
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+            logger.info(f'Restored {len(cookies)} session cookies into browser')
+            return len(cookies)
+        except Exception as e:
+            logger.warning(f'Failed to restore session cookies: {e}')
+            return 0
+
+    def save_from_driver(self, driver) -> bool:
+        try:
+            result = driver.execute_cdp_cmd('Network.getCookies', {'urls': COOKIE_URLS})
+        except Exception as e:
+            logger.debug(f'Failed to read browser cookies: {e}')
+            return False
+        return self.save(result.get('cookies') or [])
+
+    def save_from_session(self, session) -> bool:
+        """Persist cookies from a requests.Session (direct HTTP API mode)."""
+        cookies = []
+        for c in session.cookies:
+            cookie = {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path or '/', 'secure': bool(c.secure)}
+            if c.expires:
+                cookie['expires'] = c.expires
+            cookies.append(cookie)
+        return self.save(cookies)
@@ -2,21 +2,184 @@ from __future__ import annotations
 
 # Centralized runtime tuning (edit values below)
 
+# Scheduling: every account is its own job with its own deadline. A failed
+# fetch is retried FETCH_ATTEMPTS_PER_RUN times in place, then re-queued with
+# exponential backoff; after CIRCUIT_BREAKER_FAILURES failed runs in a row the
+# account is only tried again once per cooldown.
+SCAN_INTERVAL_MINUTES = 15
+STATUS_INTERVAL_HOURS = 6
+CLEANUP_INTERVAL_HOURS = 24
+FETCH_ATTEMPTS_PER_RUN = 2
+SCHEDULER_RETRY_BASE_SECONDS = 90
+SCHEDULER_RETRY_MAX_SECONDS = 1800
+CIRCUIT_BREAKER_FAILURES = 5
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = 3600
+# Accounts due within this many seconds of each other are scanned in one pass,
+# so batched fetches, the tab pool and the driver pool keep getting batches
+SCHEDULER_GROUP_WINDOW_SECONDS = 60
+
+# Adaptive polling: each account's posting rate (EWMA, fading with
+# CADENCE_HALF_LIFE_HOURS) and hour-of-day profile are learned from post
+# timestamps and kept in SQLite. Polls are spaced so about
+# CADENCE_POSTS_PER_POLL new posts are expected per poll, within the
+# account's bounds. config.toml can override per account with
+# poll_min_minutes / poll_max_minutes, or set hot = true for the HOT_ bounds.
+# Accounts with no learned cadence yet poll every SCAN_INTERVAL_MINUTES, and
+# with ADAPTIVE_POLLING = False every account does.
+ADAPTIVE_POLLING = True
+POLL_MIN_MINUTES = 5
+POLL_MAX_MINUTES = 120
+HOT_POLL_MIN_MINUTES = 1
+HOT_POLL_MAX_MINUTES = 3
+CADENCE_HALF_LIFE_HOURS = 24 * 7
+CADENCE_POSTS_PER_POLL = 0.5
+CADENCE_SPREAD = 0.1
+
+# SQLite: one writer thread group-commits up to DB_WRITE_BATCH_MAX queued
+# writes per transaction; lookups use a pool of read-only connections.
+DB_WRITE_BATCH_MAX = 64
+DB_READER_POOL_SIZE = 3
+# Ids at or below an account's watermark are rejected without a query,
+# except the WATERMARK_RECHECK_IDS highest on a page, which are still looked
+# up because pinned, deleted or delayed posts can arrive out of id order.
+WATERMARK_RECHECK_IDS = 20
+
+# Delivery outbox: rendered posts are queued in SQLite and sent by a
+# background worker; a post counts as processed only once Discord accepts it.
+# Failed sends back off from OUTBOX_RETRY_BASE_SECONDS up to
+# OUTBOX_RETRY_MAX_SECONDS and keep retrying until Discord answers; only a
+# message Discord rejects outright (4xx other than 429) is dropped.
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_RETRY_MAX_SECONDS = 900
+OUTBOX_RETENTION_DAYS = 7
+# A backlog of embed posts from one account is packed into shared webhook
+# calls within Discord's per-message limits (OUTBOX_PACK_MAX_EMBEDS = 1 disables)
+OUTBOX_PACK_MAX_EMBEDS = 10
+OUTBOX_PACK_MAX_FILES = 10
+OUTBOX_PACK_MAX_CHARS = 6000
+OUTBOX_PACK_MAX_MB = 8.0
+
+# Discord: one keep-alive session per webhook host. Sends follow the
+# per-webhook budget Discord reports in X-RateLimit-* headers, and 429/5xx
+# responses are retried after the Retry-After Discord returns.
+DISCORD_POOL_SIZE = 4  # keep-alive connections per webhook host
+DISCORD_SEND_RETRIES = 3  # retries for direct sends such as the status message
+DELIVERY_CONCURRENCY = 4  # webhooks sent to in parallel by the delivery worker
+
 # Rate limiting for fetching posts (requests per time window in seconds)
 RATE_LIMIT_MAX_REQUESTS = 3
 RATE_LIMIT_TIME_WINDOW = 60  # seconds
+# Image CDN (sinaimg.cn) downloads, shared by all workers
+IMAGE_RATE_LIMIT_MAX_REQUESTS = 10
+IMAGE_RATE_LIMIT_TIME_WINDOW = 1
 
 # Network timeouts and limits
 REQUEST_TIMEOUT_SECONDS = 30
 IMAGE_MAX_DOWNLOAD_BYTES = 50 * 1024 * 1024  # 50 MB
+# A post's images download in parallel over one keep-alive session per host
+IMAGE_DOWNLOAD_WORKERS = 8
+IMAGE_PER_HOST_CONCURRENCY = 4  # downloads in flight per image host
+IMAGE_POST_DEADLINE_SECONDS = 60  # images not done by then are left out of the post
+IMAGE_DOWNLOAD_CHUNK_BYTES = 256 * 1024
 
 # Discord attachment limits (MB)
 DISCORD_ATTACHMENT_MAX_MB = 3.0
 
-# AJAX extraction wait before issuing fetch (milliseconds)
+# AJAX extraction: upper bound (milliseconds) on waiting for the page to be
+# ready and a visitor cookie to appear before issuing the fetch
 AJAX_WAIT_MS = 2500
 
-# Extraction method: "ajax_json" (default) or "mobile_dom"
+# Readiness waits (upper bounds; waits return as soon as the condition holds)
+PAGE_READY_TIMEOUT_SECONDS = 15
+WEIBO_VISITOR_COOKIES = ('SUB', '_T_WM', 'XSRF-TOKEN')
+DOM_CARD_WAIT_SECONDS = 5  # first .card render in mobile_dom
+DOM_SCROLL_WAIT_SECONDS = 1.5  # new cards after each scroll
+
+# Anti-bot jitter: random delays are drawn from an explicit budget per scan
+# cycle (each driver pool worker has its own)
+ANTI_BOT_JITTER_BUDGET_SECONDS = 20
+HUMAN_DELAY_SECONDS = (0.5, 2.0)  # before each account fetch
+NAVIGATION_RETRY_JITTER_SECONDS = (1.0, 4.0)  # between navigation retries
+
+# Keep one m.weibo.cn page open and fetch every account through it instead
+# of navigating to each profile ("ajax_json" method only)
+AJAX_RESIDENT_PAGE = True
+RESIDENT_PAGE_MAX_AGE_SECONDS = 1800  # reload the resident page after this long
+
+# Batched fetch: accounts per in-page batch script (1 disables batching) and
+# fetches in flight inside the page. Each account in a batch takes its own
+# rate-limiter slot, so batching saves round trips, not request budget.
+AJAX_BATCH_SIZE = 10
+AJAX_BATCH_CONCURRENCY = 4
+
+# Tab pool: parallel fetches in this many m.weibo.cn tabs of one Chrome
+# ("ajax_json" only; takes precedence over AJAX_BATCH_SIZE, 1 disables).
+# Every fetch still takes its own rate-limiter slot.
+TAB_POOL_SIZE = 1
+
+# Network capture: how long to wait for the page's own getIndex response
+NETWORK_CAPTURE_TIMEOUT_MS = 8000
+
+# Extraction method: "ajax_json" (default), "mobile_dom", "http_api" or "network_capture"
+# "http_api" calls the m.weibo.cn getIndex API directly over a pooled HTTP
+# session; Chrome is only started to mint fresh visitor cookies when the API
+# rejects the session, and quit again once they are saved.
+# "network_capture" loads the profile and reuses the getIndex response the
+# page fetches itself (read from the CDP performance log).
 EXTRACTION_METHOD = "ajax_json"
 
+# Mobile user agent shared by Chrome and the direct HTTP API session
+MOBILE_USER_AGENT = 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1'
+
+# Direct HTTP API (EXTRACTION_METHOD = "http_api")
+HTTP_API_POOL_SIZE = 4  # keep-alive connections kept per host
+HTTP_API_MAX_COOKIE_REFRESHES = 1  # browser cookie refreshes per fetch before giving up
+
+# Persistent browser session (survives PM2 restarts and driver recreation)
+CHROME_PROFILE_DIR = 'data/chrome_profile'  # None for a throwaway profile per driver
+SESSION_STORE_PATH = 'data/session_cookies.json'
+# Session rotation only wipes the stored cookies/profile after this many
+# consecutive failures for an account; earlier rotations restart warm.
+SESSION_WIPE_AFTER_FAILURES = 3
+# Session rotation: "context" swaps to a fresh incognito browser context in
+# the running Chrome (milliseconds); "restart" relaunches Chrome
+SESSION_ROTATION_MODE = "context"
+
+# Lean browser: block images, fonts, media and trackers and cap renderer
+# memory. Only used for the extraction methods listed here ("mobile_dom"
+# reads image URLs from the rendered page, so it keeps a full browser).
+LEAN_BROWSER_METHODS = ('ajax_json', 'http_api', 'network_capture')
+LEAN_RENDERER_PROCESS_LIMIT = 2
+LEAN_JS_HEAP_MB = 256
+LEAN_BLOCKED_URL_PATTERNS = (
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.m3u8', '*.ts', '*.flv', '*.mp3',
+    '*://wx*.sinaimg.cn/*', '*://tva*.sinaimg.cn/*', '*://tvax*.sinaimg.cn/*',
+    '*beacon.sina.com.cn*', '*hm.baidu.com*', '*google-analytics.com*', '*googletagmanager.com*',
+)
+
+# Proactive driver recycling between scans (0 disables a limit). The memory
+# limit covers chromedriver plus all Chrome processes and needs psutil.
+DRIVER_MAX_RSS_MB = 1500
+DRIVER_MAX_SCANS = 500
+DRIVER_MAX_AGE_HOURS = 12
+
+# Driver startup: resolved chromedriver path is cached on disk instead of
+# asking webdriver-manager on every launch
+CHROMEDRIVER_CACHE_PATH = 'data/chromedriver_cache.json'
+CHROMEDRIVER_CACHE_TTL_HOURS = 24 * 7
+# Keep a pre-launched spare Chrome so recreating the driver is an instant
+# swap. Costs one idle browser; spares run without CHROME_PROFILE_DIR (a
+# profile can only be open once) and are warmed from the cookie store.
+DRIVER_WARM_SPARE = False
 
+# Driver pool: several Chromes, each with its own profile (suffixed _w<n>),
+# cookie store and rate limiter. Accounts stay pinned to one worker; the pool
+# grows by one worker per DRIVER_POOL_ACCOUNTS_PER_WORKER due accounts and
+# only retires a worker after it has idled for DRIVER_POOL_IDLE_MINUTES.
+# MAX_SIZE = 1 keeps the single-browser behaviour. Not used with http_api.
+DRIVER_POOL_MIN_SIZE = 1
+DRIVER_POOL_MAX_SIZE = 1
+DRIVER_POOL_ACCOUNTS_PER_WORKER = 20
+DRIVER_POOL_IDLE_MINUTES = 30
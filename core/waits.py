@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from typing import Dict, Any, Iterable, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.1
+
+_PAGE_STATE_SCRIPT = """
+var html = ((document.documentElement && document.documentElement.outerHTML) || '').toLowerCase();
+var errorIndicators = arguments[0], weiboIndicators = arguments[1];
+return {
+  url: location.href,
+  readyState: document.readyState,
+  length: html.length,
+  error: errorIndicators.some(function(i){ return html.indexOf(i) !== -1; }),
+  weibo: weiboIndicators.some(function(i){ return html.indexOf(i) !== -1; })
+};
+"""
+ERROR_INDICATORS = ['neterror', 'redirectloop', 'error page', '无法访问', 'redirect loop']
+WEIBO_INDICATORS = ['weibo', '微博', 'feed', 'card', 'profile']
+
+
+def _until(driver, condition, timeout: float) -> Optional[Any]:
+    if timeout <= 0:
+        return None
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(condition)
+    except TimeoutException:
+        return None
+
+
+def wait_for_document_ready(driver, timeout: float) -> bool:
+    """Wait until document.readyState is 'complete'"""
+    return bool(_until(driver, lambda d: d.execute_script('return document.readyState') == 'complete', timeout))
+
+
+def wait_for_cookie(driver, names: Iterable[str], timeout: float) -> bool:
+    """Wait until any of the named cookies is visible to the current page"""
+    names = set(names)
+    return bool(_until(driver, lambda d: any(c.get('name') in names for c in d.get_cookies()), timeout))
+
+
+def wait_for_selector_count(driver, css: str, timeout: float, min_count: int = 1) -> int:
+    """Wait until at least min_count elements match css; returns the last count seen"""
+    script = 'return document.querySelectorAll(arguments[0]).length'
+    last = {'count': 0}
+
+    def enough(d):
+        last['count'] = d.execute_script(script, css) or 0
+        return last['count'] >= min_count
+
+    _until(driver, enough, timeout)
+    return last['count']
+
+
+def wait_for_weibo_session(driver, timeout: float, cookie_names: Iterable[str]) -> bool:
+    """Wait for the page to finish loading and for a visitor cookie, within one time budget"""
+    deadline = time.monotonic() + timeout
+    ready = wait_for_document_ready(driver, timeout)
+    has_cookie = wait_for_cookie(driver, cookie_names, deadline - time.monotonic())
+    if not (ready and has_cookie):
+        logger.debug(f'Weibo session wait ended early (ready={ready}, cookie={has_cookie})')
+    return ready and has_cookie
+
+
+def probe_page_state(driver) -> Dict[str, Any]:
+    """Cheap in-page summary used instead of pulling the whole page_source"""
+    return driver.execute_script(_PAGE_STATE_SCRIPT, ERROR_INDICATORS, WEIBO_INDICATORS) or {}
+
+
+class JitterBudget:
+    """Anti-bot random delays drawn from a fixed time budget per scan cycle.
+
+    Each sleep() picks a random delay in [low, high] but never spends more
+    than what is left of the cycle budget, so jitter can't dominate scan time.
+    """
+
+    def __init__(self, seconds_per_cycle: float):
+        self.seconds_per_cycle = seconds_per_cycle
+        self.remaining = seconds_per_cycle
+
+    def reset(self):
+        self.remaining = self.seconds_per_cycle
+
+    def sleep(self, low: float, high: float) -> float:
+        delay = min(random.uniform(low, high), max(0.0, self.remaining))
+        if delay > 0:
+            time.sleep(delay)
+            self.remaining -= delay
+        return delay
@@ -1,28 +1,217 @@
 from __future__ import annotations
 
+import hashlib
 import platform
 import logging
 import subprocess
 import shutil
+import os
+import time
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Iterable, Callable, Dict
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
 
+from core import settings
+
+try:
+    import psutil
+except ImportError:  # optional: memory-based recycling and reaping are disabled without it
+    psutil = None
+
 logger = logging.getLogger(__name__)
 
+# Extra (ignored) Chrome switch that tags browsers started by this bot so
+# orphans can be told apart from a user's own Chrome. It carries a hash of
+# the working directory (where data/ lives), so a restart still finds its own
+# orphans but bot instances running from other directories are left alone.
+INSTANCE_MARKER = '--weibo-discord-bot=' + hashlib.sha1(str(Path.cwd().resolve()).encode()).hexdigest()[:12]
+
 
 class WebDriverManager:
+    # Recent launch durations in ms: 'cold' for full Chrome starts, 'warm' for spare swaps
+    startup_timings: Dict[str, deque] = {'cold': deque(maxlen=50), 'warm': deque(maxlen=50)}
+
+    @staticmethod
+    def record_startup(kind: str, elapsed_ms: float):
+        WebDriverManager.startup_timings.setdefault(kind, deque(maxlen=50)).append(elapsed_ms)
+
+    @staticmethod
+    def startup_summary() -> str:
+        parts = []
+        for kind, samples in WebDriverManager.startup_timings.items():
+            if samples:
+                parts.append(f"{kind}: n={len(samples)} avg={sum(samples) / len(samples):.0f}ms last={samples[-1]:.0f}ms")
+        return ', '.join(parts) or 'no driver starts yet'
+
+    @staticmethod
+    def create_driver(headless: bool = True, profile_dir: str | None = None, lean: bool = False) -> webdriver.Chrome:
+        """Create Chrome driver - simplified and reliable
+
+        With profile_dir, Chrome keeps cookies and its HTTP cache on disk so
+        restarts come back with a warm session. With lean, images, fonts,
+        media and trackers are blocked and renderer memory is capped.
+        """
+        return WebDriverManager._create_chrome_driver(headless, profile_dir, lean)
+
+    @staticmethod
+    def apply_lean_network(driver: webdriver.Chrome) -> bool:
+        """Block heavy resource types for the current target via CDP"""
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(settings.LEAN_BLOCKED_URL_PATTERNS)})
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to apply lean network blocking: {e}")
+            return False
+
     @staticmethod
-    def create_driver(headless: bool = True) -> webdriver.Chrome:
-        """Create Chrome driver - simplified and reliable"""
-        return WebDriverManager._create_chrome_driver(headless)
+    def wipe_profile(profile_dir: str | None):
+        """Delete a persistent Chrome profile (the driver must already be quit)"""
+        if not profile_dir:
+            return
+        path = Path(profile_dir).resolve()
+        if not str(path).startswith(str(Path.cwd().resolve())):
+            logger.warning(f"Refusing to wipe profile outside working directory: {path}")
+            return
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Wiped Chrome profile: {path}")
+        except Exception as e:
+            logger.warning(f"Failed to wipe Chrome profile {path}: {e}")
+
+    @staticmethod
+    def open_browser_context(driver: webdriver.Chrome, viewport: tuple | None = None, lean: bool = False) -> str:
+        """Switch the driver to a fresh incognito browser context in the same Chrome
+
+        Creates the context and a blank tab in it, closes the previous tab
+        and returns the new browserContextId. No process is spawned, so a new
+        identity costs milliseconds instead of a full restart.
+        """
+        old_handle = driver.current_window_handle
+        before = set(driver.window_handles)
+        context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+        target_id = driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})['targetId']
+        new_handles = [h for h in driver.window_handles if h not in before]
+        new_handle = target_id if target_id in new_handles or not new_handles else new_handles[0]
+        driver.switch_to.window(old_handle)
+        driver.close()
+        driver.switch_to.window(new_handle)
+        if viewport:
+            width, height = viewport
+            driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride',
+                                   {'width': width, 'height': height, 'deviceScaleFactor': 0, 'mobile': False})
+        if lean:
+            WebDriverManager.apply_lean_network(driver)
+        return context_id
 
     @staticmethod
-    def _get_chrome_options(headless: bool = True) -> ChromeOptions:
+    def dispose_browser_context(driver: webdriver.Chrome, context_id: str | None):
+        if not context_id:
+            return
+        try:
+            driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except Exception as e:
+            logger.debug(f"Failed to dispose browser context {context_id}: {e}")
+
+    @staticmethod
+    def get_process_tree(driver: webdriver.Chrome) -> List["psutil.Process"]:
+        """chromedriver plus every Chrome process it spawned"""
+        if psutil is None or driver is None:
+            return []
+        try:
+            root = psutil.Process(driver.service.process.pid)
+            return [root] + root.children(recursive=True)
+        except Exception:
+            return []
+
+    @staticmethod
+    def measure_rss_mb(driver: webdriver.Chrome) -> Optional[float]:
+        """Total resident memory of the driver's process tree, or None if unavailable"""
+        procs = WebDriverManager.get_process_tree(driver)
+        if not procs:
+            return None
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except Exception:
+                continue
+        return total / (1024 ** 2)
+
+    @staticmethod
+    def quit_driver(driver: webdriver.Chrome, timeout: float = 5.0):
+        """Quit the driver and kill any of its processes that survive quit()"""
+        if driver is None:
+            return
+        procs = WebDriverManager.get_process_tree(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit driver cleanly, killing its processes: {e}")
+        if not procs:
+            return
+        try:
+            _, alive = psutil.wait_procs(procs, timeout=timeout)
+            for proc in alive:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+            if alive:
+                logger.warning(f"Killed {len(alive)} leftover Chrome/chromedriver processes")
+        except Exception as e:
+            logger.warning(f"Error reaping driver processes: {e}")
+
+    @staticmethod
+    def reap_orphans(live_drivers: Iterable[webdriver.Chrome] = ()) -> int:
+        """Kill bot-started Chrome/chromedriver processes not owned by a live driver"""
+        if psutil is None:
+            return 0
+        live = set()
+        for driver in live_drivers:
+            live.update(p.pid for p in WebDriverManager.get_process_tree(driver))
+        victims = []
+        for proc in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline']):
+            try:
+                if proc.info['pid'] in live:
+                    continue
+                cmdline = proc.info['cmdline'] or []
+                name = (proc.info['name'] or '').lower()
+                if INSTANCE_MARKER in cmdline:
+                    victims.append(proc)
+                elif 'chromedriver' in name and proc.info['ppid'] == os.getpid():
+                    victims.append(proc)
+            except Exception:
+                continue
+        killed = 0
+        for proc in victims:
+            try:
+                for child in proc.children(recursive=True):
+                    child.kill()
+                proc.kill()
+                killed += 1
+            except Exception:
+                continue
+        if killed:
+            logger.warning(f"Reaped {killed} orphaned Chrome/chromedriver processes")
+        return killed
+
+    @staticmethod
+    def _get_chrome_options(headless: bool = True, profile_dir: str | None = None, lean: bool = False) -> ChromeOptions:
         options = ChromeOptions()
         if headless:
             options.add_argument('--headless=new')
+        if profile_dir:
+            path = Path(profile_dir).resolve()
+            path.mkdir(parents=True, exist_ok=True)
+            options.add_argument(f'--user-data-dir={path}')
+            options.add_argument('--profile-directory=Default')
         options.add_argument('--no-sandbox')
         options.add_argument('--disable-dev-shm-usage')
         options.add_argument('--disable-gpu')
@@ -38,24 +227,87 @@ class WebDriverManager:
         options.add_argument('--disable-renderer-backgrounding')
         options.add_argument('--disable-features=TranslateUI')
         options.add_argument('--disable-ipc-flooding-protection')
+        options.add_argument(INSTANCE_MARKER)
         
         # Set a mobile user agent for mobile Weibo API compatibility
-        options.add_argument('--user-agent=Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1')
-        
+        options.add_argument(f'--user-agent={settings.MOBILE_USER_AGENT}')
+
+        # Content settings are written into persistent profiles, so always set them explicitly
+        content_setting = 2 if lean else 1
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': content_setting,
+            'profile.managed_default_content_settings.media_stream': content_setting,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+        if lean:
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_argument('--disable-remote-fonts')
+            options.add_argument('--mute-audio')
+            options.add_argument('--autoplay-policy=user-gesture-required')
+            options.add_argument(f'--renderer-process-limit={settings.LEAN_RENDERER_PROCESS_LIMIT}')
+            options.add_argument(f'--js-flags=--max-old-space-size={settings.LEAN_JS_HEAP_MB}')
+
         try:
             options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         except Exception:
             pass
         return options
 
+    @staticmethod
+    def _load_chromedriver_cache() -> Optional[str]:
+        """Return the cached chromedriver path if it is fresh and still on disk"""
+        try:
+            cache_path = Path(settings.CHROMEDRIVER_CACHE_PATH)
+            if not cache_path.exists():
+                return None
+            cache = json.loads(cache_path.read_text(encoding='utf-8'))
+            age_hours = (time.time() - float(cache.get('resolved_at', 0))) / 3600
+            path = cache.get('path')
+            if age_hours > settings.CHROMEDRIVER_CACHE_TTL_HOURS or not path or not os.access(path, os.X_OK):
+                return None
+            logger.debug(f"Using cached ChromeDriver {cache.get('version', '?')} at {path}")
+            return path
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable chromedriver cache: {e}")
+            return None
+
+    @staticmethod
+    def _save_chromedriver_cache(path: str):
+        try:
+            version = ''
+            try:
+                out = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=10)
+                version = out.stdout.strip()
+            except Exception:
+                pass
+            cache_path = Path(settings.CHROMEDRIVER_CACHE_PATH)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(json.dumps({'path': path, 'version': version, 'resolved_at': time.time()}), encoding='utf-8')
+        except Exception as e:
+            logger.debug(f"Failed to write chromedriver cache: {e}")
+
+    @staticmethod
+    def invalidate_chromedriver_cache():
+        try:
+            Path(settings.CHROMEDRIVER_CACHE_PATH).unlink(missing_ok=True)
+        except Exception:
+            pass
+
     @staticmethod
     def _find_chromedriver() -> str:
         """Find ChromeDriver in system PATH or common locations"""
+        # Reuse the last resolution instead of asking webdriver-manager every time
+        cached = WebDriverManager._load_chromedriver_cache()
+        if cached:
+            return cached
+
         # First try to use webdriver-manager with the latest version
         try:
             from webdriver_manager.chrome import ChromeDriverManager
             # Use the latest version that should be compatible
-            return ChromeDriverManager().install()
+            path = ChromeDriverManager().install()
+            WebDriverManager._save_chromedriver_cache(path)
+            return path
         except Exception as e:
             logger.warning(f"Failed to use webdriver-manager: {e}")
         
@@ -79,21 +331,126 @@ class WebDriverManager:
         raise Exception("ChromeDriver not found. Please install it manually: brew install --cask chromedriver")
     
     @staticmethod
-    def _create_chrome_driver(headless: bool = True) -> webdriver.Chrome:
+    def _create_chrome_driver(headless: bool = True, profile_dir: str | None = None, lean: bool = False) -> webdriver.Chrome:
         """Create Chrome driver with optimized options for Weibo scraping"""
-        options = WebDriverManager._get_chrome_options(headless)
+        started = time.monotonic()
+        options = WebDriverManager._get_chrome_options(headless, profile_dir, lean)
         chromedriver_path = WebDriverManager._find_chromedriver()
-        
+
         logger.info(f"Using ChromeDriver at: {chromedriver_path}")
-        service = ChromeService(chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=options)
+        try:
+            driver = webdriver.Chrome(service=ChromeService(chromedriver_path), options=options)
+        except Exception as e:
+            # A stale cached driver (e.g. after a Chrome update) fails here; resolve again once
+            if WebDriverManager._load_chromedriver_cache() != chromedriver_path:
+                raise
+            logger.warning(f"Cached ChromeDriver failed to start, re-resolving: {e}")
+            WebDriverManager.invalidate_chromedriver_cache()
+            chromedriver_path = WebDriverManager._find_chromedriver()
+            driver = webdriver.Chrome(service=ChromeService(chromedriver_path), options=options)
         
         # Hide webdriver property to avoid detection
         try:
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         except Exception:
             pass
-            
+
+        if lean:
+            WebDriverManager.apply_lean_network(driver)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        WebDriverManager.record_startup('cold', elapsed_ms)
+        logger.info(f"Chrome cold start took {elapsed_ms:.0f}ms")
         return driver
 
 
+class DriverRecycler:
+    """Decides when a long-running driver should be replaced between scans"""
+
+    def __init__(self, max_rss_mb: float = 0, max_scans: int = 0, max_age_seconds: float = 0):
+        self.max_rss_mb = max_rss_mb
+        self.max_scans = max_scans
+        self.max_age_seconds = max_age_seconds
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.monotonic()
+        self.scans = 0
+
+    def record_scan(self):
+        self.scans += 1
+
+    def should_recycle(self, driver: webdriver.Chrome) -> Optional[str]:
+        """Return the reason the driver should be recycled, or None"""
+        if driver is None:
+            return None
+        if self.max_scans and self.scans >= self.max_scans:
+            return f"scan count {self.scans} >= {self.max_scans}"
+        age = time.monotonic() - self.started_at
+        if self.max_age_seconds and age >= self.max_age_seconds:
+            return f"age {age / 3600:.1f}h >= {self.max_age_seconds / 3600:.1f}h"
+        if self.max_rss_mb:
+            rss = WebDriverManager.measure_rss_mb(driver)
+            if rss is not None and rss >= self.max_rss_mb:
+                return f"RSS {rss:.0f}MB >= {self.max_rss_mb:.0f}MB"
+        return None
+
+
+class WarmSpareDriver:
+    """A driver launched in the background so a recreate is an instant swap"""
+
+    def __init__(self, factory: Callable[[], webdriver.Chrome]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._driver: Optional[webdriver.Chrome] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def launching(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def driver(self) -> Optional[webdriver.Chrome]:
+        return self._driver
+
+    def prepare(self):
+        """Start launching a spare unless one is ready or on its way"""
+        with self._lock:
+            if self._closed or self._driver is not None or self.launching:
+                return
+            self._thread = threading.Thread(target=self._launch, name='warm-spare-driver', daemon=True)
+            self._thread.start()
+
+    def _launch(self):
+        try:
+            driver = self._factory()
+        except Exception as e:
+            logger.warning(f"Failed to launch warm spare driver: {e}")
+            return
+        with self._lock:
+            if self._closed:
+                WebDriverManager.quit_driver(driver)
+                return
+            self._driver = driver
+        logger.info("Warm spare driver ready")
+
+    def take(self) -> Optional[webdriver.Chrome]:
+        """Hand over the spare if it is ready and alive (never blocks on a launch)"""
+        with self._lock:
+            driver, self._driver = self._driver, None
+        if driver is None:
+            return None
+        try:
+            driver.current_url
+        except Exception:
+            logger.warning("Warm spare driver died, discarding it")
+            WebDriverManager.quit_driver(driver)
+            return None
+        return driver
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            driver, self._driver = self._driver, None
+        if driver is not None:
+            WebDriverManager.quit_driver(driver)
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
 import time
 from typing import Optional, Dict, Any, List
 
 from selenium import webdriver
 
+from core import settings
+from core.waits import wait_for_weibo_session
+
+
+logger = logging.getLogger(__name__)
+
 
 def is_json_like(text: Optional[str]) -> bool:
     if not text:
@@ -26,39 +33,166 @@ def extract_ajax_json(driver: webdriver.Remote, profile_url: str, uid: str, wait
     # Use mobile site instead of desktop
     mobile_url = f"https://m.weibo.cn/u/{uid}"
     driver.get(mobile_url)
-    if wait_before_ms > 0:
-        time.sleep(wait_before_ms / 1000.0)
+    wait_for_weibo_session(driver, wait_before_ms / 1000.0, settings.WEIBO_VISITOR_COOKIES)
+    return fetch_ajax_json(driver, uid)
+
+
+def fetch_ajax_json(driver: webdriver.Remote, uid: str) -> Optional[str]:
+    """Issue the getIndex fetch from whatever m.weibo.cn page is currently loaded.
 
+    Returns raw JSON string on success (None otherwise).
+    """
     # Mobile API endpoint - containerid format is 107603 + uid
     container_id = f"107603{uid}"
     ajax_rel_url = f"/api/container/getIndex?containerid={container_id}"
 
+    # The result object is returned as-is: WebDriver already serialises it,
+    # so only the response text itself needs a JSON decode on our side.
     script = (
         "var done = arguments[0];\n"
         "(async () => {\n"
         "  try {\n"
         "    const res = await fetch('" + ajax_rel_url + "', { credentials: 'include' });\n"
         "    const text = await res.text();\n"
-        "    done(JSON.stringify({ ok: true, status: res.status, text }));\n"
+        "    done({ ok: true, status: res.status, text });\n"
         "  } catch (e) {\n"
-        "    done(JSON.stringify({ ok: false, error: String(e && e.message || e) }));\n"
+        "    done({ ok: false, error: String(e && e.message || e) });\n"
         "  }\n"
         "})();\n"
     )
 
-    raw = driver.execute_async_script(script)
-    try:
-        obj = json.loads(raw)
-    except Exception:
-        return None
-
-    if not obj.get('ok'):
+    obj = driver.execute_async_script(script)
+    if not isinstance(obj, dict) or not obj.get('ok'):
         return None
 
     text = obj.get('text') or ''
     return text if is_json_like(text) else None
 
 
+_BATCH_FETCH_SCRIPT = """
+var uids = arguments[0], concurrency = Math.max(1, arguments[1] | 0), timeoutMs = arguments[2] | 0;
+var done = arguments[arguments.length - 1];
+var results = {}, next = 0;
+async function one(uid) {
+  var ctrl = new AbortController();
+  var timer = timeoutMs > 0 ? setTimeout(function(){ ctrl.abort(); }, timeoutMs) : null;
+  try {
+    var res = await fetch('/api/container/getIndex?containerid=107603' + uid, { credentials: 'include', signal: ctrl.signal });
+    results[uid] = { ok: true, status: res.status, text: await res.text() };
+  } catch (e) {
+    results[uid] = { ok: false, error: String(e && e.message || e) };
+  } finally {
+    if (timer) clearTimeout(timer);
+  }
+}
+async function worker() {
+  while (next < uids.length) { await one(uids[next++]); }
+}
+var workers = [];
+for (var i = 0; i < Math.min(concurrency, uids.length); i++) workers.push(worker());
+Promise.all(workers).then(function(){ done(results); });
+"""
+
+
+def extract_ajax_json_batch(driver: webdriver.Remote, uids: List[str], concurrency: int = 4,
+                            timeout_ms: int = 30000) -> Dict[str, Optional[str]]:
+    """Fetch getIndex for many uids with a single async script call.
+
+    The page fans the fetches out with at most `concurrency` in flight and
+    returns every result at once. Must run on a loaded m.weibo.cn page.
+
+    Returns {uid: raw JSON string or None}.
+    """
+    uids = [str(u) for u in uids]
+    if not uids:
+        return {}
+    waves = -(-len(uids) // max(1, concurrency))
+    # The batch needs a longer script timeout than single fetches; put it back afterwards
+    try:
+        previous_timeout = driver.timeouts.script
+    except Exception:
+        previous_timeout = None
+    try:
+        driver.set_script_timeout(waves * timeout_ms / 1000.0 + 5)
+    except Exception:
+        pass
+    try:
+        results = driver.execute_async_script(_BATCH_FETCH_SCRIPT, uids, concurrency, timeout_ms)
+    except Exception as e:
+        logger.warning(f'Batch fetch script failed: {e}')
+        return {uid: None for uid in uids}
+    finally:
+        if previous_timeout is not None:
+            try:
+                driver.set_script_timeout(previous_timeout)
+            except Exception:
+                pass
+    out: Dict[str, Optional[str]] = {}
+    for uid in uids:
+        obj = (results or {}).get(uid)
+        text = obj.get('text') if isinstance(obj, dict) and obj.get('ok') else None
+        out[uid] = text if is_json_like(text) else None
+    return out
+
+
+class ResidentPage:
+    """One m.weibo.cn page kept open and reused for every account fetch.
+
+    The getIndex fetch only needs an m.weibo.cn origin and cookies, so the
+    page is re-navigated only when it is stale: a new driver, max_age
+    elapsed, or a fetch that came back without JSON.
+    """
+
+    HOME_URL = 'https://m.weibo.cn/'
+
+    def __init__(self, wait_before_ms: int = 1500, max_age_seconds: float = 1800):
+        self.wait_before_ms = wait_before_ms
+        self.max_age_seconds = max_age_seconds
+        self._driver_id: Optional[int] = None
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        self._driver_id = None
+
+    def ensure(self, driver: webdriver.Remote):
+        if self._driver_id == id(driver) and time.monotonic() - self._loaded_at < self.max_age_seconds:
+            return
+        driver.get(self.HOME_URL)
+        wait_for_weibo_session(driver, self.wait_before_ms / 1000.0, settings.WEIBO_VISITOR_COOKIES)
+        self._driver_id = id(driver)
+        self._loaded_at = time.monotonic()
+        logger.info('Resident m.weibo.cn page loaded')
+
+    def fetch(self, driver: webdriver.Remote, uid: str) -> Optional[str]:
+        self.ensure(driver)
+        raw = fetch_ajax_json(driver, uid)
+        if raw is None:
+            logger.info('Resident page returned no JSON, re-navigating')
+            self.invalidate()
+            self.ensure(driver)
+            raw = fetch_ajax_json(driver, uid)
+        return raw
+
+    def fetch_batch(self, driver: webdriver.Remote, uids: List[str], concurrency: int = 4,
+                    timeout_ms: int = 30000, before_retry=None) -> Dict[str, Optional[str]]:
+        """Fetch uids in one script call; failed ones are retried once on a fresh page.
+
+        before_retry(n) is called before the n failed uids are fetched again
+        (used for rate limiting).
+        """
+        self.ensure(driver)
+        results = extract_ajax_json_batch(driver, uids, concurrency, timeout_ms)
+        failed = [uid for uid, raw in results.items() if raw is None]
+        if failed:
+            logger.info(f'Resident page returned no JSON for {len(failed)}/{len(results)} accounts, re-navigating')
+            self.invalidate()
+            self.ensure(driver)
+            if before_retry:
+                before_retry(len(failed))
+            results.update(extract_ajax_json_batch(driver, failed, concurrency, timeout_ms))
+        return results
+
+
 def _convert_mobile_mblog_to_desktop_format(mblog: Dict[str, Any]) -> Dict[str, Any]:
     """Convert mobile API mblog format to match the desktop API format expected by the rest of the code."""
     result = mblog.copy()
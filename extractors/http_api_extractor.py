@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Optional, Callable, Dict, Any, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+
+from core import settings
+from core.waits import wait_for_weibo_session
+from extractors.ajax_extractor import is_json_like
+
+
+logger = logging.getLogger(__name__)
+
+API_URL = 'https://m.weibo.cn/api/container/getIndex'
+# Status codes m.weibo.cn uses when it wants a (new) visitor session
+REJECT_STATUS_CODES = {301, 302, 303, 307, 403, 418, 432}
+
+
+class HttpApiClient:
+    """Pooled HTTP session for the m.weibo.cn getIndex API.
+
+    Chrome is only used to mint visitor cookies when the API starts
+    rejecting the session; every other request is a plain HTTPS round trip.
+    """
+
+    def __init__(self, pool_size: int = 4):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': settings.MOBILE_USER_AGENT,
+            'Accept': 'application/json, text/plain, */*',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'MWeibo-Pwa': '1',
+            'X-Requested-With': 'XMLHttpRequest',
+        })
+        self.cookie_refreshes = 0
+        # Set by fetch_index when the last failure was m.weibo.cn turning the session away
+        self.rejected = False
+
+    def has_cookies(self) -> bool:
+        return len(self.session.cookies) > 0
+
+    def load_cookies(self, cookies: List[Dict[str, Any]]) -> int:
+        """Copy Selenium-style cookie dicts into the HTTP session."""
+        count = 0
+        for c in cookies:
+            name = c.get('name')
+            if not name:
+                continue
+            self.session.cookies.set(name, c.get('value', ''), domain=c.get('domain', ''), path=c.get('path', '/'))
+            count += 1
+        return count
+
+    def refresh_cookies(self, driver: webdriver.Remote, uid: str, wait_ms: int) -> bool:
+        """Let the browser negotiate visitor cookies, then adopt them."""
+        try:
+            driver.get(f'https://m.weibo.cn/u/{uid}')
+            wait_for_weibo_session(driver, wait_ms / 1000.0, settings.WEIBO_VISITOR_COOKIES)
+            cookies = driver.get_cookies()
+        except Exception as e:
+            logger.warning(f'Failed to mint visitor cookies in browser: {e}')
+            return False
+        self.session.cookies.clear()
+        count = self.load_cookies(cookies)
+        self.cookie_refreshes += 1
+        logger.info(f'Refreshed HTTP API session with {count} browser cookies')
+        return count > 0
+
+    def fetch_index(self, uid: str) -> Optional[str]:
+        """Return the raw getIndex JSON for uid, or None.
+
+        rejected tells a refused session (a reject status or the HTML visitor
+        page) apart from network errors and empty accounts, which new
+        cookies would not fix.
+        """
+        self.rejected = False
+        params = {'type': 'uid', 'value': uid, 'containerid': f'107603{uid}'}
+        headers = {'Referer': f'https://m.weibo.cn/u/{uid}'}
+        try:
+            response = self.session.get(API_URL, params=params, headers=headers,
+                                        timeout=settings.REQUEST_TIMEOUT_SECONDS, allow_redirects=False)
+        except requests.RequestException as e:
+            logger.warning(f'HTTP API request failed for UID {uid}: {e}')
+            return None
+        if response.status_code in REJECT_STATUS_CODES:
+            logger.warning(f'HTTP API rejected session for UID {uid} (HTTP {response.status_code})')
+            self.rejected = True
+            return None
+        text = response.text
+        if response.status_code == 200 and not is_json_like(text):
+            logger.warning(f'HTTP API served the visitor page for UID {uid}')
+            self.rejected = True
+            return None
+        if response.status_code != 200:
+            logger.warning(f'HTTP API returned HTTP {response.status_code} for UID {uid}')
+            return None
+        try:
+            if json.loads(text).get('ok') != 1:
+                logger.warning(f'HTTP API returned ok != 1 for UID {uid}')
+                return None
+        except Exception:
+            return None
+        return text
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception:
+            pass
+
+
+def extract_http_api_json(client: HttpApiClient, uid: str, get_driver: Callable[[], webdriver.Remote],
+                          wait_before_ms: int = 2500, max_refreshes: int = 1,
+                          release_driver: Optional[Callable[[], None]] = None) -> Optional[str]:
+    """Fetch posts for uid without the browser.
+
+    get_driver is only called when the API rejects the current cookies (or
+    there are none yet), so Chrome is started lazily and rarely;
+    release_driver is called once the new cookies are in use so the browser
+    does not stay running between refreshes.
+
+    Returns raw JSON string on success (None otherwise).
+    """
+    used_driver = False
+    try:
+        if not client.has_cookies():
+            used_driver = True
+            client.refresh_cookies(get_driver(), uid, wait_before_ms)
+        raw = client.fetch_index(uid)
+        refreshes = 0
+        while raw is None and client.rejected and refreshes < max_refreshes:
+            refreshes += 1
+            used_driver = True
+            if not client.refresh_cookies(get_driver(), uid, wait_before_ms):
+                break
+            raw = client.fetch_index(uid)
+        return raw
+    finally:
+        if used_driver and release_driver:
+            release_driver()
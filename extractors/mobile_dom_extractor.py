@@ -1,94 +1,138 @@
 from __future__ import annotations
 
-import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set
 
 from selenium import webdriver
 
+from core import settings
+from core.waits import wait_for_selector_count
 
-def extract_mobile_dom_as_list(driver: webdriver.Remote, mobile_url: str, max_scrolls: int = 6) -> List[Dict[str, Any]]:
+
+# Installed once per page: a MutationObserver buffers every newly rendered
+# card (keyed by detail id) so each drain only returns cards not seen before.
+_INSTALL_COLLECTOR_SCRIPT = """
+return (function(){
+  if (window.__wbCollector) return true;
+  function txt(el){return el? (el.innerText||el.textContent||'').trim():''}
+  function strip(html){var d=document.createElement('div'); d.innerHTML=html||''; return (d.textContent||d.innerText||'').trim()}
+  function isContentImage(img, src){
+    if (!src) return false;
+    if (src.indexOf('data:')===0) return false;
+    if (!/sinaimg\\.cn/.test(src)) return false;
+    if (/\\/(emoji|emoticon|face)\\//i.test(src)) return false;
+    if (img.closest('.m-icon, .m-emoji, .m-card-head, .m-avatar-box, .badge, .weibo-top')) return false;
+    return true;
+  }
+  var seen = new Set(), pending = new Set(), buffer = [], counter = 0;
+  function serialize(c){
+    var tEl = c.querySelector('.weibo-text');
+    var textRaw = strip(tEl? tEl.innerHTML: '');
+    var timeEl = c.querySelector('time') || c.querySelector('.time');
+    var created = timeEl?(timeEl.getAttribute('datetime')||txt(timeEl)):'';
+    var srcEl = c.querySelector('.from') || c.querySelector('.weibo-footer');
+    var source = txt(srcEl)||'m.weibo.cn';
+    var id = null;
+    var linkEl = c.querySelector('a[href*="/detail/"]');
+    if (linkEl){ var m=(linkEl.getAttribute('href')||'').match(/\\/detail\\/(\\d+)/); if(m){ id=parseInt(m[1]); } }
+    var imgs=[];
+    var media = c.querySelector('.weibo-media, .mwb-media-wrap, .mwb-media, .weibo-media-wrap');
+    var imgEls = media ? media.querySelectorAll('img') : [];
+    Array.prototype.forEach.call(imgEls, function(img){
+      var src = img.getAttribute('data-src') || img.getAttribute('src') || '';
+      if (!isContentImage(img, src)) return;
+      var u = src.replace(/\\/\\/wx\\d+\\./,'//wx4.').replace('/orj360/','/large/');
+      if (u.indexOf('/large/')===-1 && /\\/bmiddle\\//.test(u)===false) {
+        u = u.replace('/mw690/','/large/').replace('/mw1024/','/large/');
+      }
+      imgs.push(u);
+    });
+    var pic_infos={};
+    imgs.forEach(function(u,i){
+      pic_infos['p'+i]={ large: {url: u}, bmiddle: {url: u.replace('/large/','/bmiddle/')} };
+    });
+    var key = id ? 'id:' + id : 'text:' + textRaw.slice(0, 200) + '|' + created;
+    var item={ id: id || (Date.now()/1000|0)*100000 + (counter++ % 100000), text_raw: textRaw, created_at: created || new Date().toString(), source: source };
+    if (Object.keys(pic_infos).length){ item.pic_infos = pic_infos; }
+    return { key: key, item: item };
+  }
+  function consider(c){
+    try{
+      // Cards can be inserted before their text renders; retry those on the next drain
+      if (!c.querySelector('.weibo-text')) { pending.add(c); return; }
+      pending.delete(c);
+      // Skip pinned/top posts (置顶)
+      var topEl = c.querySelector('.weibo-top, .card-top, .top-tag');
+      if (topEl && (topEl.innerText||'').indexOf('置顶') !== -1) return;
+      var cardText = c.innerText || '';
+      if (cardText.indexOf('置顶') !== -1 && cardText.indexOf('置顶') < 50) return;
+      var s = serialize(c);
+      if (seen.has(s.key)) return;
+      seen.add(s.key);
+      buffer.push(s.item);
+    }catch(e){}
+  }
+  function scan(root){
+    if (root.matches && root.matches('.card')) consider(root);
+    if (root.querySelectorAll) Array.prototype.forEach.call(root.querySelectorAll('.card'), consider);
+  }
+  new MutationObserver(function(mutations){
+    mutations.forEach(function(m){
+      Array.prototype.forEach.call(m.addedNodes, function(n){ if (n.nodeType === 1) scan(n); });
+    });
+  }).observe(document.body, { childList: true, subtree: true });
+  scan(document);
+  window.__wbCollector = {
+    drain: function(){
+      Array.from(pending).forEach(function(c){ if (c.isConnected) consider(c); else pending.delete(c); });
+      var out = buffer; buffer = []; return out;
+    }
+  };
+  return true;
+})();
+"""
+
+_DRAIN_SCRIPT = "return window.__wbCollector ? window.__wbCollector.drain() : null;"
+
+
+def extract_mobile_dom_as_list(driver: webdriver.Remote, mobile_url: str, max_scrolls: int = 6,
+                               known_ids: Optional[Callable[[Iterable[int]], Set[int]]] = None) -> List[Dict[str, Any]]:
+    """Collect posts from the rendered mobile profile, newest first.
+
+    Cards are gathered incrementally by an in-page observer, so each scroll
+    only transfers cards that were not returned before. With known_ids (a
+    callable returning the subset of ids already processed), scrolling stops
+    at the first already-known post; otherwise it keeps going until
+    max_scrolls, which makes backfill possible. Without known_ids the first
+    non-empty pass is returned.
+    """
     driver.get(mobile_url)
-    time.sleep(2)
+    card_count = wait_for_selector_count(driver, '.card', settings.DOM_CARD_WAIT_SECONDS)
+    driver.execute_script(_INSTALL_COLLECTOR_SCRIPT)
     collected: List[Dict[str, Any]] = []
+    seen = set()
     for _ in range(max_scrolls):
-        posts = driver.execute_script(
-            """
-            return (function(){
-              function txt(el){return el? (el.innerText||el.textContent||'').trim():''}
-              function strip(html){var d=document.createElement('div'); d.innerHTML=html||''; return (d.textContent||d.innerText||'').trim()}
-              var cards = Array.from(document.querySelectorAll('.card')).filter(function(c){
-                if (!c.querySelector('.weibo-text')) return false;
-                // Skip pinned/top posts (置顶)
-                var topEl = c.querySelector('.weibo-top, .card-top, .top-tag');
-                if (topEl && (topEl.innerText||'').indexOf('置顶') !== -1) return false;
-                var cardText = c.innerText || '';
-                if (cardText.indexOf('置顶') !== -1 && cardText.indexOf('置顶') < 50) return false;
-                return true;
-              });
-              var out=[];
-              cards.forEach(function(c,idx){
-                try{
-                  var tEl = c.querySelector('.weibo-text');
-                  var textRaw = strip(tEl? tEl.innerHTML: '');
-                  var timeEl = c.querySelector('time') || c.querySelector('.time');
-                  var created = timeEl?(timeEl.getAttribute('datetime')||txt(timeEl)):'';
-                  var srcEl = c.querySelector('.from') || c.querySelector('.weibo-footer');
-                  var source = txt(srcEl)||'m.weibo.cn';
-                  var id = null;
-                  var linkEl = c.querySelector('a[href*="/detail/"]');
-                  if (linkEl){ var m=(linkEl.getAttribute('href')||'').match(/\/detail\/(\d+)/); if(m){ id=parseInt(m[1]); } }
-                  var imgs=[];
-                  var media = c.querySelector('.weibo-media, .mwb-media-wrap, .mwb-media, .weibo-media-wrap');
-                  var imgEls = media ? media.querySelectorAll('img') : [];
-                  function isContentImage(img, src){
-                    if (!src) return false;
-                    if (src.indexOf('data:')===0) return false;
-                    if (!/sinaimg\.cn/.test(src)) return false;
-                    if (/\/(emoji|emoticon|face)\//i.test(src)) return false;
-                    if (img.closest('.m-icon, .m-emoji, .m-card-head, .m-avatar-box, .badge, .weibo-top')) return false;
-                    return true;
-                  }
-                  Array.prototype.forEach.call(imgEls, function(img){
-                    var src = img.getAttribute('data-src') || img.getAttribute('src') || '';
-                    if (!isContentImage(img, src)) return;
-                    var u = src.replace(/\/\/wx\d+\./,'//wx4.').replace('/orj360/','/large/');
-                    if (u.indexOf('/large/')===-1 && /\/bmiddle\//.test(u)===false) {
-                      u = u.replace('/mw690/','/large/').replace('/mw1024/','/large/');
-                    }
-                    imgs.push(u);
-                  });
-                  var pic_infos={};
-                  imgs.forEach(function(u,i){
-                    var key='p'+i;
-                    pic_infos[key]={ large: {url: u}, bmiddle: {url: u.replace('/large/','/bmiddle/')} };
-                  });
-                  var item={ id: id || (Date.now()/1000|0)*100000 + idx, text_raw: textRaw, created_at: created || new Date().toString(), source: source };
-                  if (Object.keys(pic_infos).length){ item.pic_infos = pic_infos; }
-                  out.push(item);
-                }catch(e){}
-              });
-              return out;
-            })();
-            """
-        )
-        if isinstance(posts, list) and posts:
-            # Unique by id
-            seen = set()
-            out = []
-            for it in posts:
-                i = it.get('id')
-                if i in seen:
-                    continue
-                seen.add(i)
-                out.append(it)
-            if out:
-                return out
+        posts = driver.execute_script(_DRAIN_SCRIPT)
+        if posts is None:
+            # Page was replaced (e.g. redirect); reinstall the observer
+            driver.execute_script(_INSTALL_COLLECTOR_SCRIPT)
+            posts = driver.execute_script(_DRAIN_SCRIPT) or []
+        new_items = []
+        for it in posts if isinstance(posts, list) else []:
+            i = it.get('id')
+            if i in seen:
+                continue
+            seen.add(i)
+            new_items.append(it)
+        collected.extend(new_items)
+        if known_ids is None:
+            if collected:
+                return collected
+        elif new_items and known_ids([it['id'] for it in new_items if isinstance(it.get('id'), int)]):
+            break
         try:
             driver.execute_script('window.scrollBy(0, Math.min(1200, (document.body.scrollHeight||2000)));')
         except Exception:
             pass
-        time.sleep(1)
+        # Wait for the next page of cards instead of a fixed pause
+        card_count = wait_for_selector_count(driver, '.card', settings.DOM_SCROLL_WAIT_SECONDS, min_count=card_count + 1)
     return collected
-
-
-
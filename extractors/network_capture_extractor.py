@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import time
+from typing import Optional, Dict, Any, List
+
+from selenium import webdriver
+
+from extractors.ajax_extractor import is_json_like, fetch_ajax_json
+
+
+logger = logging.getLogger(__name__)
+
+
+def drain_performance_log(driver: webdriver.Remote) -> List[Dict[str, Any]]:
+    """Read (and thereby clear) chromedriver's buffered performance log.
+
+    Returns the decoded DevTools messages ({'method': ..., 'params': ...}).
+    """
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return []
+    messages = []
+    for entry in entries:
+        try:
+            message = json.loads(entry['message']).get('message')
+            if isinstance(message, dict):
+                messages.append(message)
+        except Exception:
+            continue
+    return messages
+
+
+def _is_feed_url(url: str, uid: str) -> int:
+    """Rank getIndex URLs: 2 for the 107603 feed container, 1 for the profile tab container."""
+    if '/api/container/getIndex' not in url:
+        return 0
+    if f'107603{uid}' in url:
+        return 2
+    if f'230413{uid}' in url:
+        return 1
+    return 0
+
+
+def extract_network_capture_json(driver: webdriver.Remote, uid: str, timeout_ms: int = 8000,
+                                 poll_ms: int = 200, fallback_fetch: bool = True) -> Optional[str]:
+    """Load the mobile profile and reuse the getIndex XHR the page fires itself.
+
+    Network.responseReceived / Network.loadingFinished events are read from
+    the performance log and the body is pulled with Network.getResponseBody,
+    so no extra request is made. If the page's own XHR is not seen in time
+    the in-page fetch is used as a fallback.
+
+    Returns raw JSON string on success (None otherwise).
+    """
+    # Discard whatever earlier navigations left in the log
+    drain_performance_log(driver)
+    driver.get(f'https://m.weibo.cn/u/{uid}')
+
+    candidates: Dict[str, int] = {}
+    finished = set()
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    while True:
+        for message in drain_performance_log(driver):
+            method = message.get('method')
+            params = message.get('params') or {}
+            if method == 'Network.responseReceived':
+                rank = _is_feed_url((params.get('response') or {}).get('url', ''), uid)
+                if rank:
+                    candidates[params.get('requestId')] = rank
+            elif method == 'Network.loadingFinished':
+                finished.add(params.get('requestId'))
+        ready = sorted((rank, rid) for rid, rank in candidates.items() if rid in finished)
+        # Take the feed container as soon as it lands; settle for the profile tab at the deadline
+        if ready and (ready[-1][0] == 2 or time.monotonic() >= deadline):
+            for _, request_id in reversed(ready):
+                text = _get_response_body(driver, request_id)
+                if is_json_like(text):
+                    logger.info(f'Captured getIndex response for UID {uid} from page traffic')
+                    return text
+            break
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(poll_ms / 1000.0)
+
+    if fallback_fetch:
+        logger.info(f'No getIndex response captured for UID {uid}, falling back to in-page fetch')
+        return fetch_ajax_json(driver, uid)
+    return None
+
+
+def _get_response_body(driver: webdriver.Remote, request_id: str) -> Optional[str]:
+    try:
+        result = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+    except Exception as e:
+        logger.debug(f'Network.getResponseBody failed for {request_id}: {e}')
+        return None
+    body = result.get('body') or ''
+    if result.get('base64Encoded'):
+        try:
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        except Exception:
+            return None
+    return body
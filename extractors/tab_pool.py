@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from selenium import webdriver
+
+from core import settings
+from core.waits import wait_for_weibo_session
+from core.webdriver_manager import WebDriverManager
+from extractors.ajax_extractor import is_json_like
+
+
+logger = logging.getLogger(__name__)
+
+# Starts a getIndex fetch in the tab without waiting for it; the result is
+# parked on window.__wbJob and picked up by polling
+_START_SCRIPT = """
+var uid = arguments[0], token = arguments[1], timeoutMs = arguments[2] | 0;
+window.__wbJob = { token: token, done: false };
+(async function(){
+  var ctrl = new AbortController();
+  var timer = timeoutMs > 0 ? setTimeout(function(){ ctrl.abort(); }, timeoutMs) : null;
+  try {
+    var res = await fetch('/api/container/getIndex?containerid=107603' + uid, { credentials: 'include', signal: ctrl.signal });
+    window.__wbJob = { token: token, done: true, ok: true, status: res.status, text: await res.text() };
+  } catch (e) {
+    window.__wbJob = { token: token, done: true, ok: false, error: String(e && e.message || e) };
+  } finally {
+    if (timer) clearTimeout(timer);
+  }
+})();
+return true;
+"""
+_POLL_SCRIPT = "return window.__wbJob || null;"
+
+
+class TabPool:
+    """Several m.weibo.cn tabs in one Chrome, each running one account fetch.
+
+    WebDriver itself is serial, so each tab only gets a fire-and-forget
+    start command and is polled afterwards; the fetches (and any renderer
+    work) overlap across tabs while the browser process is shared.
+    """
+
+    HOME_URL = 'https://m.weibo.cn/'
+
+    def __init__(self, size: int, wait_before_ms: int = 2500, timeout_ms: int = 30000, lean: bool = False):
+        self.size = max(1, size)
+        self.wait_before_ms = wait_before_ms
+        self.timeout_ms = timeout_ms
+        self.lean = lean
+        self._driver_id: Optional[int] = None
+        self._handles: List[str] = []
+        self._stale: set = set()
+
+    def reset(self, driver: Optional[webdriver.Remote] = None):
+        """Close the pool's tabs (if the driver is still usable) and forget them"""
+        if driver is not None and self._driver_id == id(driver):
+            try:
+                main_handle = driver.current_window_handle
+                for handle in self._handles:
+                    if handle == main_handle:
+                        continue
+                    driver.switch_to.window(handle)
+                    driver.close()
+                driver.switch_to.window(main_handle)
+            except Exception as e:
+                logger.debug(f'Error closing pooled tabs: {e}')
+        self._driver_id = None
+        self._handles = []
+        self._stale = set()
+
+    def _ensure_tabs(self, driver: webdriver.Remote):
+        if self._driver_id != id(driver):
+            self._driver_id = id(driver)
+            self._handles = []
+            self._stale = set()
+        live = set(driver.window_handles)
+        self._handles = [h for h in self._handles if h in live]
+        main_handle = driver.current_window_handle
+        while len(self._handles) < self.size:
+            driver.switch_to.window(main_handle)
+            driver.switch_to.new_window('tab')
+            handle = driver.current_window_handle
+            if self.lean:
+                WebDriverManager.apply_lean_network(driver)
+            self._handles.append(handle)
+            self._stale.add(handle)
+        for handle in list(self._stale):
+            self._navigate(driver, handle)
+        driver.switch_to.window(main_handle)
+
+    def _navigate(self, driver: webdriver.Remote, handle: str):
+        driver.switch_to.window(handle)
+        driver.get(self.HOME_URL)
+        wait_for_weibo_session(driver, self.wait_before_ms / 1000.0, settings.WEIBO_VISITOR_COOKIES)
+        self._stale.discard(handle)
+
+    def iter_fetch(self, driver: webdriver.Remote, uids: List[str], before_start=None) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (uid, raw JSON or None) as each tab finishes, in completion order.
+
+        before_start(n) is called before each wave of n fetches is started
+        (used for rate limiting).
+        """
+        queue = [str(u) for u in uids]
+        if not queue:
+            return
+        main_handle = driver.current_window_handle
+        self._ensure_tabs(driver)
+        busy: Dict[str, Tuple[str, str, float]] = {}
+        deadline_s = self.timeout_ms / 1000.0 + 5
+        try:
+            while queue or busy:
+                free = [h for h in self._handles if h not in busy]
+                if queue and free:
+                    if before_start:
+                        before_start(min(len(free), len(queue)))
+                    for handle in free:
+                        if not queue:
+                            break
+                        uid = queue.pop(0)
+                        token = uuid.uuid4().hex
+                        try:
+                            if handle in self._stale:
+                                self._navigate(driver, handle)
+                            driver.switch_to.window(handle)
+                            driver.execute_script(_START_SCRIPT, uid, token, self.timeout_ms)
+                            busy[handle] = (uid, token, time.monotonic())
+                        except Exception as e:
+                            logger.warning(f'Failed to start fetch for UID {uid} in pooled tab: {e}')
+                            self._stale.add(handle)
+                            yield uid, None
+                finished = False
+                for handle, (uid, token, started) in list(busy.items()):
+                    try:
+                        driver.switch_to.window(handle)
+                        job = driver.execute_script(_POLL_SCRIPT)
+                    except Exception as e:
+                        logger.warning(f'Lost pooled tab while fetching UID {uid}: {e}')
+                        job = {'token': token, 'done': True, 'ok': False}
+                    timed_out = time.monotonic() - started > deadline_s
+                    if not (isinstance(job, dict) and job.get('token') == token and job.get('done')) and not timed_out:
+                        continue
+                    del busy[handle]
+                    finished = True
+                    text = job.get('text') if isinstance(job, dict) and job.get('ok') else None
+                    if not is_json_like(text):
+                        # Non-JSON usually means the tab's session went stale
+                        self._stale.add(handle)
+                        text = None
+                    yield uid, text
+                if busy and not finished:
+                    time.sleep(0.05)
+        finally:
+            try:
+                driver.switch_to.window(main_handle)
+            except Exception:
+                pass
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import settings
+from core.database import DatabaseManager
+from core.image_manager import ImageManager
+from services.discord_client import DiscordClient, SendResult
+
+
+logger = logging.getLogger(__name__)
+
+# Payload keys of messages that may share a webhook call with their neighbours
+PACKABLE_KEYS = {'avatar_url', 'username', 'embeds'}
+
+
+def _embed_chars(embed: Dict[str, Any]) -> int:
+    """Characters Discord counts towards its 6000 per-message embed limit"""
+    total = len(embed.get('title') or '') + len(embed.get('description') or '')
+    total += len((embed.get('footer') or {}).get('text') or '') + len((embed.get('author') or {}).get('name') or '')
+    for field in embed.get('fields') or []:
+        total += len(field.get('name') or '') + len(field.get('value') or '')
+    return total
+
+
+def _files_size(row: Dict[str, Any]) -> int:
+    size = 0
+    for file_path in json.loads(row['files'] or '[]'):
+        try:
+            size += Path(file_path).stat().st_size
+        except OSError:
+            pass
+    return size
+
+
+class DeliveryWorker:
+    """Drains the outbox table to Discord from a background thread.
+
+    Messages for one webhook go out in the order they were queued: while
+    the oldest one waits for a retry or for the webhook's rate-limit bucket
+    to reset, later ones for that webhook wait too, and other webhooks keep
+    sending. Rows survive restarts, so in-flight posts resume without
+    re-fetching or re-rendering.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, image_manager: ImageManager, client: DiscordClient):
+        self.db_manager = db_manager
+        self.image_manager = image_manager
+        self.client = client
+        self.delivered = 0
+        self.failed = 0
+        self.packed_calls = 0
+        self._counters = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=settings.DELIVERY_CONCURRENCY, thread_name_prefix='discord-send')
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self):
+        """Start the worker if needed and let it look at the outbox now"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='discord-delivery', daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.clear()
+            try:
+                wait = self.drain()
+            except Exception as e:
+                logger.error(f'Delivery worker error: {e}')
+                wait = settings.OUTBOX_RETRY_BASE_SECONDS
+            if not self._stopped:
+                self._wake.wait(wait)
+
+    def drain(self) -> float:
+        """Send every message that is due; returns seconds until the next one is.
+
+        Webhooks are drained concurrently, each in its own queue order.
+        """
+        next_due = 60.0
+        while not self._stopped:
+            rows = self.db_manager.pending_outbox()
+            if not rows:
+                return next_due
+            by_webhook: Dict[str, List[Dict[str, Any]]] = {}
+            for row in rows:
+                by_webhook.setdefault(row['webhook_url'], []).append(row)
+            results = list(self._pool.map(self._drain_webhook, by_webhook.values()))
+            sent = sum(calls for calls, _ in results)
+            next_due = min((wait for _, wait in results if wait is not None), default=60.0)
+            if not sent:
+                return max(0.1, next_due)
+        return next_due
+
+    def _drain_webhook(self, rows: List[Dict[str, Any]]) -> Tuple[int, Optional[float]]:
+        """Send one webhook's due messages in order; returns (calls made, seconds until it can go on)"""
+        calls = 0
+        index = 0
+        while index < len(rows) and not self._stopped:
+            url = rows[index]['webhook_url']
+            now = time.time()
+            due_at = max(rows[index]['next_attempt_at'], now + self.client.wait_time(url))
+            if due_at > now:
+                return calls, due_at - now
+            batch = self._pack(rows[index], rows[index + 1:], now)
+            index += len(batch)
+            calls += 1
+            if not self._deliver(batch):
+                return calls, max(0.1, self.client.wait_time(url))
+        return calls, None
+
+    @staticmethod
+    def _packable(payload: Dict[str, Any]) -> bool:
+        return bool(payload.get('embeds')) and set(payload) <= PACKABLE_KEYS
+
+    def _pack(self, head: Dict[str, Any], following: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        """head plus the queued messages right after it that fit in the same webhook call.
+
+        Only embed messages of the same account are packed, so a backlog
+        catches up with one call per up to ten posts while each post keeps
+        its own embed and link.
+        """
+        payload = json.loads(head['payload'])
+        if settings.OUTBOX_PACK_MAX_EMBEDS <= 1 or not self._packable(payload):
+            return [head]
+        extras = {k: v for k, v in payload.items() if k != 'embeds'}
+        embeds = len(payload['embeds'])
+        chars = sum(_embed_chars(e) for e in payload['embeds'])
+        files = len(json.loads(head['files'] or '[]'))
+        size = _files_size(head)
+        batch = [head]
+        for row in following:
+            candidate = json.loads(row['payload'])
+            if (row['account'] != head['account'] or row['next_attempt_at'] > now
+                    or not self._packable(candidate)
+                    or {k: v for k, v in candidate.items() if k != 'embeds'} != extras):
+                break
+            embeds += len(candidate['embeds'])
+            chars += sum(_embed_chars(e) for e in candidate['embeds'])
+            files += len(json.loads(row['files'] or '[]'))
+            size += _files_size(row)
+            if (embeds > settings.OUTBOX_PACK_MAX_EMBEDS or files > settings.OUTBOX_PACK_MAX_FILES
+                    or chars > settings.OUTBOX_PACK_MAX_CHARS or size > settings.OUTBOX_PACK_MAX_MB * 1024 ** 2):
+                break
+            batch.append(row)
+        return batch
+
+    def _message(self, batch: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Tuple[str, bytes]]]:
+        """Merge a batch into one payload; clashing attachment names are renamed in their embeds"""
+        payload = json.loads(batch[0]['payload'])
+        if len(batch) == 1:
+            return payload, self._files(batch[0])
+        embeds: List[Dict[str, Any]] = []
+        files: List[Tuple[str, bytes]] = []
+        names = set()
+        for n, row in enumerate(batch):
+            row_embeds = json.dumps(json.loads(row['payload'])['embeds'], ensure_ascii=False)
+            for name, data in self._files(row):
+                if name in names:
+                    unique = f'{n}_{name}'
+                    row_embeds = row_embeds.replace(f'attachment://{name}', f'attachment://{unique}')
+                    name = unique
+                names.add(name)
+                files.append((name, data))
+            embeds.extend(json.loads(row_embeds))
+        payload['embeds'] = embeds
+        return payload, files
+
+    def _files(self, row: Dict[str, Any]) -> List[Tuple[str, bytes]]:
+        files = []
+        for file_path in json.loads(row['files'] or '[]'):
+            path = Path(file_path)
+            try:
+                files.append((path.name, path.read_bytes()))
+            except OSError as e:
+                logger.warning(f'Attachment {path.name} for post {row["weibo_id"]} is missing: {e}')
+        return files
+
+    def _deliver(self, batch: List[Dict[str, Any]]) -> bool:
+        """Send one message (or a packed batch); returns False if it has to be retried later"""
+        try:
+            payload, files = self._message(batch)
+            result = self.client.post(batch[0]['webhook_url'], payload, files)
+        except Exception as e:
+            result = SendResult(None, error=str(e))
+        if len(batch) > 1:
+            with self._counters:
+                self.packed_calls += 1
+            if result.final and not result.ok:
+                # Do not let one bad post take its neighbours down; send them one by one
+                logger.warning(f'Packed message of {len(batch)} posts was rejected ({result.error}); sending separately')
+                return all(self._deliver([row]) for row in batch)
+        if result.final:
+            for row in batch:
+                self._finish(row, result.ok, result.error)
+            return True
+        if result.rate_limited:
+            # Discord said exactly when to come back; that is not a failed attempt
+            for row in batch:
+                self.db_manager.retry_outbox(row['id'], result.error, time.time() + result.retry_after, count_attempt=False)
+            return False
+        # Network errors and 5xx are never final: an outage only delays posts,
+        # retrying every OUTBOX_RETRY_MAX_SECONDS once the backoff tops out
+        for row in batch:
+            attempts = row['attempts'] + 1
+            delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** min(attempts - 1, 16)), settings.OUTBOX_RETRY_MAX_SECONDS)
+            if result.retry_after is not None:
+                delay = result.retry_after
+            logger.warning(f'Delivery of post {row["weibo_id"]} failed ({result.error}, attempt {attempts}); retrying in {delay:.0f}s')
+            self.db_manager.retry_outbox(row['id'], result.error, time.time() + delay)
+        return False
+
+    def _finish(self, row: Dict[str, Any], delivered: bool, error: Optional[str]):
+        self.db_manager.finish_outbox(row['id'], delivered, error)
+        self.image_manager.release([Path(p) for p in json.loads(row['files'] or '[]')])
+        with self._counters:
+            if delivered:
+                self.delivered += 1
+            else:
+                self.failed += 1
+        if not delivered:
+            logger.warning(f'Post {row["weibo_id"]} was rejected by Discord: {error}')
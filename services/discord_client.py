@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_id(url: str) -> str:
+    """The id part of a webhook URL; the token never shows up in logs or stats"""
+    return url.split('/webhooks/')[-1].split('/')[0]
+
+
+def embed_payload(embed) -> Dict[str, Any]:
+    """JSON form of a DiscordEmbed without its empty fields"""
+    return {k: v for k, v in embed.__dict__.items() if v}
+
+
+class SendResult:
+    """Outcome of one webhook call.
+
+    retry_after is the delay Discord asked for (429, or a 5xx with
+    Retry-After); status is None when the request never got a response.
+    """
+
+    def __init__(self, status: Optional[int], retry_after: Optional[float] = None,
+                 error: Optional[str] = None, rate_limited: bool = False):
+        self.status = status
+        self.retry_after = retry_after
+        self.error = error
+        self.rate_limited = rate_limited
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and self.status < 400
+
+    @property
+    def final(self) -> bool:
+        """Delivered, or rejected in a way a retry will not fix (4xx other than 429)"""
+        return self.status is not None and (self.status < 400 or (self.status < 500 and self.status != 429))
+
+
+class _Bucket:
+    """Budget of one webhook as last reported by X-RateLimit-* headers"""
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+
+
+class DiscordClient:
+    """Keep-alive sessions per webhook host plus Discord's own rate-limit buckets.
+
+    Each response updates its webhook's bucket from X-RateLimit-Remaining
+    and X-RateLimit-Reset-After, so a webhook with budget left is sent to
+    immediately and one without waits exactly until Discord resets it.
+    429s block the webhook (or every webhook, for a global limit) for the
+    Retry-After Discord returns.
+    """
+
+    def __init__(self, pool_size: int = 4):
+        self.pool_size = pool_size
+        self._sessions: Dict[str, requests.Session] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_until = 0.0
+        self._lock = threading.Lock()
+        # post() runs on the DELIVERY_CONCURRENCY send threads
+        self._counters = threading.Lock()
+        self.sent = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def _session(self, url: str) -> requests.Session:
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def _bucket(self, url: str) -> _Bucket:
+        key = webhook_id(url)
+        with self._lock:
+            return self._buckets.setdefault(key, _Bucket())
+
+    def wait_time(self, url: str) -> float:
+        """Seconds until url may be called again without hitting a known limit"""
+        now = time.time()
+        bucket = self._bucket(url)
+        wait = max(self._global_until, bucket.blocked_until) - now
+        if bucket.remaining is not None and bucket.remaining <= 0:
+            wait = max(wait, bucket.reset_at - now)
+        return max(0.0, wait)
+
+    def _update(self, url: str, response: requests.Response) -> Optional[float]:
+        """Record the response's rate-limit headers; returns the Retry-After delay if any"""
+        now = time.time()
+        bucket = self._bucket(url)
+        headers = response.headers
+        try:
+            if 'X-RateLimit-Remaining' in headers:
+                bucket.remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset-After' in headers:
+                bucket.reset_at = now + float(headers['X-RateLimit-Reset-After'])
+        except ValueError:
+            pass
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            try:
+                retry_after = float(body.get('retry_after') or headers.get('Retry-After') or 1)
+            except (TypeError, ValueError):
+                retry_after = 1.0
+            if body.get('global') or headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global':
+                self._global_until = max(self._global_until, now + retry_after)
+            else:
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+        elif response.status_code >= 500 and headers.get('Retry-After'):
+            try:
+                retry_after = float(headers['Retry-After'])
+            except ValueError:
+                retry_after = None
+        return retry_after
+
+    def post(self, url: str, payload: Dict[str, Any], files: Optional[List[Tuple[str, bytes]]] = None) -> SendResult:
+        """One webhook call without waiting or retrying"""
+        payload = {k: v for k, v in payload.items() if v is not None}
+        try:
+            if files:
+                response = self._session(url).post(
+                    url, params={'wait': 'true'},
+                    data={'payload_json': json.dumps(payload, default=str, ensure_ascii=False)},
+                    files=[(f'files[{i}]', (name, data)) for i, (name, data) in enumerate(files)],
+                    timeout=settings.REQUEST_TIMEOUT_SECONDS)
+            else:
+                response = self._session(url).post(url, params={'wait': 'true'}, json=payload,
+                                                   timeout=settings.REQUEST_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            with self._counters:
+                self.errors += 1
+            return SendResult(None, error=str(e))
+        retry_after = self._update(url, response)
+        if response.status_code == 429:
+            with self._counters:
+                self.rate_limited += 1
+            logger.debug(f'Webhook {webhook_id(url)} rate limited for {retry_after:.2f}s')
+            return SendResult(429, retry_after, 'HTTP 429', rate_limited=True)
+        if response.status_code >= 400:
+            with self._counters:
+                self.errors += 1
+            return SendResult(response.status_code, retry_after, f'HTTP {response.status_code}: {response.text[:200]}')
+        with self._counters:
+            self.sent += 1
+        return SendResult(response.status_code)
+
+    def send(self, url: str, payload: Dict[str, Any], files: Optional[List[Tuple[str, bytes]]] = None,
+             retries: int = 3) -> SendResult:
+        """Blocking send for one-off messages: waits for budget and retries 429/5xx as Discord asks"""
+        result = SendResult(None, error='not sent')
+        for attempt in range(retries + 1):
+            wait = self.wait_time(url)
+            if wait > 0:
+                time.sleep(wait)
+            result = self.post(url, payload, files)
+            if result.final:
+                return result
+            if attempt < retries:
+                time.sleep(result.retry_after if result.retry_after is not None else 2 ** attempt)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._counters:
+            return {'sent': self.sent, 'rate_limited': self.rate_limited, 'errors': self.errors}
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
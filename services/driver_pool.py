@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import math
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core import settings
+from core.rate_limiter import RateLimiter, get_bucket
+from core.waits import JitterBudget
+from core.session_store import SessionStore
+from core.webdriver_manager import WebDriverManager, DriverRecycler
+from extractors.ajax_extractor import ResidentPage
+from extractors.tab_pool import TabPool
+
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserWorker:
+    """One Chrome plus everything that belongs to its session identity.
+
+    Each worker has its own profile directory, cookie store, rate limiter,
+    jitter budget and page state, so accounts pinned to it keep a warm session.
+    """
+
+    def __init__(self, worker_id: int, profile_dir: Optional[str], session_store: SessionStore, rate_limiter: RateLimiter):
+        self.worker_id = worker_id
+        self.profile_dir = profile_dir
+        self.session_store = session_store
+        self.rate_limiter = rate_limiter
+        self.jitter = JitterBudget(settings.ANTI_BOT_JITTER_BUDGET_SECONDS)
+        self.recycler = DriverRecycler(max_rss_mb=settings.DRIVER_MAX_RSS_MB, max_scans=settings.DRIVER_MAX_SCANS,
+                                       max_age_seconds=settings.DRIVER_MAX_AGE_HOURS * 3600)
+        self.resident_page = ResidentPage(wait_before_ms=settings.AJAX_WAIT_MS,
+                                          max_age_seconds=settings.RESIDENT_PAGE_MAX_AGE_SECONDS)
+        self.tab_pool = TabPool(settings.TAB_POOL_SIZE, wait_before_ms=settings.AJAX_WAIT_MS,
+                                timeout_ms=settings.REQUEST_TIMEOUT_SECONDS * 1000,
+                                lean=settings.EXTRACTION_METHOD in settings.LEAN_BROWSER_METHODS)
+        self.driver = None
+        self.browser_context_id: Optional[str] = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    @classmethod
+    def build(cls, worker_id: int) -> "BrowserWorker":
+        """Worker 0 uses the configured profile and cookie store; others get suffixed copies"""
+        profile_dir = settings.CHROME_PROFILE_DIR
+        store_path = Path(settings.SESSION_STORE_PATH)
+        if worker_id:
+            profile_dir = f'{profile_dir}_w{worker_id}' if profile_dir else None
+            store_path = store_path.with_name(f'{store_path.stem}_w{worker_id}{store_path.suffix}')
+        # Every worker is its own visitor identity, so each gets its own m.weibo.cn bucket
+        bucket_name = f'm.weibo.cn#w{worker_id}' if worker_id else 'm.weibo.cn'
+        rate_limiter = get_bucket(bucket_name, settings.RATE_LIMIT_MAX_REQUESTS, settings.RATE_LIMIT_TIME_WINDOW)
+        return cls(worker_id, profile_dir, SessionStore(store_path), rate_limiter)
+
+    def is_alive(self) -> bool:
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        if self.driver is not None:
+            WebDriverManager.quit_driver(self.driver)
+            self.driver = None
+
+
+class DriverPool:
+    """K browser workers with sticky account assignment.
+
+    The pool grows with the number of accounts due each round (one worker
+    per accounts_per_worker, within min/max). Surplus workers are only
+    retired after idling for idle_seconds, so a quiet round does not cost
+    the next busy one its warm sessions. Accounts keep their worker across
+    rounds unless it is retired.
+    """
+
+    def __init__(self, primary: BrowserWorker, min_size: int = 1, max_size: int = 1, accounts_per_worker: int = 20,
+                 idle_seconds: float = 1800):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.accounts_per_worker = max(1, accounts_per_worker)
+        self.idle_seconds = idle_seconds
+        self.workers: List[BrowserWorker] = [primary]
+        self._affinity: Dict[str, int] = {}
+        self._next_id = 1
+
+    def _worker(self, worker_id: int) -> Optional[BrowserWorker]:
+        for worker in self.workers:
+            if worker.worker_id == worker_id:
+                return worker
+        return None
+
+    def assign(self, key: str) -> BrowserWorker:
+        """Return the worker key is pinned to, pinning it to the least loaded worker if needed"""
+        worker = self._worker(self._affinity.get(key, -1))
+        if worker is None:
+            load = {w.worker_id: 0 for w in self.workers}
+            for worker_id in self._affinity.values():
+                if worker_id in load:
+                    load[worker_id] += 1
+            worker = min(self.workers, key=lambda w: (load[w.worker_id], w.worker_id))
+            self._affinity[key] = worker.worker_id
+        return worker
+
+    def resize(self, backlog: int):
+        target = min(self.max_size, max(self.min_size, math.ceil(backlog / self.accounts_per_worker)))
+        while len(self.workers) < target:
+            worker = BrowserWorker.build(self._next_id)
+            self._next_id += 1
+            self.workers.append(worker)
+            logger.info(f'Driver pool grew to {len(self.workers)} workers (backlog {backlog})')
+        now = time.monotonic()
+        # Never retire the primary worker (index 0)
+        for worker in reversed(self.workers[1:]):
+            if len(self.workers) <= target:
+                break
+            if now - worker.last_used < self.idle_seconds:
+                continue
+            self.workers.remove(worker)
+            worker.close()
+            self._affinity = {k: v for k, v in self._affinity.items() if v != worker.worker_id}
+            logger.info(f'Driver pool retired idle worker {worker.worker_id}; {len(self.workers)} left (backlog {backlog})')
+
+    def health_check(self, restart: Callable[[BrowserWorker], None]):
+        """Restart workers whose driver died; call while no worker is borrowed"""
+        for worker in self.workers:
+            if worker.driver is not None and not worker.is_alive():
+                logger.warning(f'Driver pool worker {worker.worker_id} is dead, restarting')
+                try:
+                    restart(worker)
+                except Exception as e:
+                    logger.error(f'Failed to restart pool worker {worker.worker_id}: {e}')
+
+    def live_drivers(self) -> List[Any]:
+        return [w.driver for w in self.workers if w.driver is not None]
+
+    def map_by_affinity(self, items: List[Any], key: Callable[[Any], str],
+                        fn: Callable[[BrowserWorker, Any], Any]) -> Iterator[Tuple[Any, Any]]:
+        """Run fn(worker, item) on each item's worker and yield (item, result) as they finish.
+
+        Each worker gets one thread that works through its own items in order,
+        so a worker's browser is only ever driven by one thread.
+        """
+        groups: Dict[int, List[Any]] = {}
+        for item in items:
+            groups.setdefault(self.assign(key(item)).worker_id, []).append(item)
+        results: queue.Queue = queue.Queue()
+
+        def run(worker: BrowserWorker, worker_items: List[Any]):
+            with worker.lock:
+                for item in worker_items:
+                    try:
+                        result = fn(worker, item)
+                    except Exception as e:
+                        logger.error(f'Pool worker {worker.worker_id} failed on {key(item)}: {e}')
+                        result = None
+                    worker.last_used = time.monotonic()
+                    results.put((item, result))
+
+        for worker_id, worker_items in groups.items():
+            threading.Thread(target=run, args=(self._worker(worker_id), worker_items),
+                             name=f'driver-pool-{worker_id}', daemon=True).start()
+        for _ in range(len(items)):
+            yield results.get()
+
+    def close(self):
+        """Quit every worker except the primary (the owner closes that one)"""
+        for worker in self.workers[1:]:
+            try:
+                worker.close()
+            except Exception as e:
+                logger.error(f'Error closing pool worker {worker.worker_id}: {e}')
+        del self.workers[1:]
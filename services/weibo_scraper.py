@@ -1,41 +1,94 @@
 from __future__ import annotations
 
+import copy
 import json
 import logging
 import random
 import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import platform
 import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
 import pytz
-import schedule
-from discord_webhook import DiscordWebhook, DiscordEmbed
+from discord_webhook import DiscordEmbed
 from core.media.image_collage import combine_images, resize_gif
 from PIL import Image
 
-from core.webdriver_manager import WebDriverManager
+from core.webdriver_manager import WebDriverManager, WarmSpareDriver
 from core.database import DatabaseManager
+from core.rate_limiter import bucket_stats
+from core.scheduler import Job, Scheduler
+from core.post_time import parse_created_at
+from core.cadence import CadenceTracker
 from core.image_manager import ImageManager
-from core.rate_limiter import RateLimiter
+from core.waits import wait_for_document_ready, probe_page_state
 from core import settings
 from extractors.ajax_extractor import extract_ajax_json, to_list_from_ajax_json
 from extractors.mobile_dom_extractor import extract_mobile_dom_as_list
+from extractors.http_api_extractor import HttpApiClient, extract_http_api_json
+from extractors.network_capture_extractor import drain_performance_log, extract_network_capture_json
+from services.delivery import DeliveryWorker
+from services.discord_client import DiscordClient, embed_payload
+from services.driver_pool import BrowserWorker, DriverPool
 
 
 logger = logging.getLogger(__name__)
 
+
+def _worker_attr(name: str) -> property:
+    """Browser state lives on the worker bound to the calling thread"""
+    return property(lambda self: getattr(self.worker, name),
+                    lambda self, value: setattr(self.worker, name, value))
+
+
 class WeiboScraper:
+    driver = _worker_attr('driver')
+    browser_context_id = _worker_attr('browser_context_id')
+    session_store = _worker_attr('session_store')
+    recycler = _worker_attr('recycler')
+    resident_page = _worker_attr('resident_page')
+    tab_pool = _worker_attr('tab_pool')
+    rate_limiter = _worker_attr('rate_limiter')
+    jitter = _worker_attr('jitter')
+
     def __init__(self, config: Dict[str, Any], account_names: List[str] = 'auto'):
         self.config = config
-        self.driver = WebDriverManager.create_driver(headless=True)
+        self._local = threading.local()
+        self.primary_worker = BrowserWorker.build(0)
+        self.driver_pool: Optional[DriverPool] = None
+        WebDriverManager.reap_orphans()
+        # A profile directory can only be open in one Chrome, so spares go without it
+        self.warm_spare = (WarmSpareDriver(lambda: self._launch_driver(use_profile=False))
+                           if settings.DRIVER_WARM_SPARE else None)
+        # The direct HTTP API only needs Chrome to mint cookies, so start it lazily
+        self.driver = None if settings.EXTRACTION_METHOD == 'http_api' else self._create_driver()
+        self.api_client = HttpApiClient(pool_size=settings.HTTP_API_POOL_SIZE)
+        self.api_client.load_cookies(self.session_store.load())
+        if settings.DRIVER_POOL_MAX_SIZE > 1 and settings.EXTRACTION_METHOD != 'http_api':
+            self.driver_pool = DriverPool(self.primary_worker, min_size=settings.DRIVER_POOL_MIN_SIZE,
+                                          max_size=settings.DRIVER_POOL_MAX_SIZE,
+                                          accounts_per_worker=settings.DRIVER_POOL_ACCOUNTS_PER_WORKER,
+                                          idle_seconds=settings.DRIVER_POOL_IDLE_MINUTES * 60)
         self.db_manager = DatabaseManager()
         self.image_manager = ImageManager(Path(__file__).resolve().parent.parent / 'images')
-        self.rate_limiter = RateLimiter(max_requests=settings.RATE_LIMIT_MAX_REQUESTS, time_window=settings.RATE_LIMIT_TIME_WINDOW)
+        self.discord = DiscordClient(pool_size=settings.DISCORD_POOL_SIZE)
+        self.delivery = DeliveryWorker(self.db_manager, self.image_manager, self.discord)
+        self.scheduler = Scheduler(retry_base=settings.SCHEDULER_RETRY_BASE_SECONDS,
+                                   retry_max=settings.SCHEDULER_RETRY_MAX_SECONDS,
+                                   breaker_failures=settings.CIRCUIT_BREAKER_FAILURES,
+                                   breaker_cooldown=settings.CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+                                   group_window=settings.SCHEDULER_GROUP_WINDOW_SECONDS)
+        # Written by the scheduler, read by pool worker threads
+        self.account_failures: Dict[str, int] = {}
+        self._failures_lock = threading.Lock()
+        self.cadence = CadenceTracker(self.db_manager, half_life_hours=settings.CADENCE_HALF_LIFE_HOURS,
+                                      posts_per_poll=settings.CADENCE_POSTS_PER_POLL, spread=settings.CADENCE_SPREAD)
         self.kawaii_emojis = ["(✿ ♥‿♥)", "(｡♥‿♥｡)"]
         self.kawaii_texts = ["ぴーかぴかに動いてるよ！", "全システム、ばっちりだよ！"]
         self.kawaii_titles = ["ぴょんぴょんアップデート！🐰", "ちゅるちゅるスクリプト！🍜"]
@@ -52,20 +105,115 @@ class WeiboScraper:
             self.account_names = account_names
         logger.info(f"WeiboScraper initialized with {len(self.account_names)} accounts")
 
+    @property
+    def worker(self) -> BrowserWorker:
+        return getattr(self._local, 'worker', None) or self.primary_worker
+
+    @contextmanager
+    def _use_worker(self, worker: BrowserWorker):
+        """Bind worker to the current thread for the duration of the block"""
+        previous = getattr(self._local, 'worker', None)
+        self._local.worker = worker
+        try:
+            yield worker
+        finally:
+            self._local.worker = previous
+
     def _is_driver_alive(self) -> bool:
+        if self.driver is None:
+            return False
         try:
             self.driver.current_url
             return True
         except Exception:
             return False
 
-    def _recreate_driver(self):
+    def _launch_driver(self, use_profile: bool = True):
+        profile_dir = self.worker.profile_dir if use_profile else None
+        return WebDriverManager.create_driver(headless=True, profile_dir=profile_dir,
+                                              lean=settings.EXTRACTION_METHOD in settings.LEAN_BROWSER_METHODS)
+
+    def _create_driver(self):
+        started = time.monotonic()
+        # Only the primary worker swaps in the warm spare
+        spare = self.warm_spare if self.worker is self.primary_worker else None
+        driver = spare.take() if spare else None
+        if driver is not None:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            WebDriverManager.record_startup('warm', elapsed_ms)
+            logger.info(f"Swapped in warm spare driver in {elapsed_ms:.0f}ms")
+        else:
+            driver = self._launch_driver()
+        self.session_store.load_into_driver(driver)
+        self.recycler.reset()
+        if spare:
+            spare.prepare()
+        return driver
+
+    def _reap_orphans(self):
+        # A spare that is still launching has no registered processes yet
+        if self.warm_spare and self.warm_spare.launching:
+            return
+        # Pool workers may be starting Chrome in other threads; the pool reaps between rounds
+        if self.driver_pool is not None:
+            return
+        WebDriverManager.reap_orphans([self.warm_spare.driver] if self.warm_spare and self.warm_spare.driver else [])
+
+    def _recreate_driver(self, wipe_session: bool = False):
         try:
             if self.driver:
-                self.driver.quit()
+                WebDriverManager.quit_driver(self.driver)
         except Exception as e:
             logger.warning(f"Failed to quit old driver (may leak process): {e}")
-        self.driver = WebDriverManager.create_driver()
+        self.driver = None
+        self.browser_context_id = None
+        self.tab_pool.reset()
+        self._reap_orphans()
+        self.resident_page.invalidate()
+        if wipe_session:
+            self.session_store.wipe()
+            WebDriverManager.wipe_profile(self.worker.profile_dir)
+        self.driver = self._create_driver()
+
+    def _maybe_recycle_driver(self):
+        """Replace the driver between scans once it is too big, too old or too used"""
+        try:
+            reason = self.recycler.should_recycle(self.driver)
+            if reason:
+                logger.info(f"Recycling WebDriver: {reason}")
+                self._save_session()
+                self._recreate_driver()
+        except Exception as e:
+            logger.warning(f"Error recycling driver: {e}")
+
+    def _save_session(self):
+        """Persist the current visitor session after a successful scan"""
+        try:
+            if settings.EXTRACTION_METHOD == 'http_api':
+                if self.api_client.has_cookies():
+                    self.session_store.save_from_session(self.api_client.session)
+            elif self.driver is not None:
+                self.session_store.save_from_driver(self.driver)
+        except Exception as e:
+            logger.debug(f"Failed to save session: {e}")
+
+    def _get_driver(self):
+        """Return a live driver, starting or recreating Chrome if needed"""
+        if not self._is_driver_alive():
+            self._recreate_driver()
+        return self.driver
+
+    def _release_driver(self):
+        """Save the cookies Chrome minted for the HTTP API, then quit it until the next refresh"""
+        self._save_session()
+        try:
+            if self.driver:
+                WebDriverManager.quit_driver(self.driver)
+        except Exception as e:
+            logger.warning(f"Failed to quit cookie driver (may leak process): {e}")
+        self.driver = None
+        self.browser_context_id = None
+        self.resident_page.invalidate()
 
     def _extract_uid_from_url(self, url: str) -> Optional[str]:
         m = re.search(r'/u/([0-9]+)', url)
@@ -98,8 +246,8 @@ class WeiboScraper:
                 except Exception as e:
                     logger.warning(f"Failed to clear sessionStorage: {e}")
                 
-                # Strategy 2: Add random delay to avoid rate limiting
-                time.sleep(random.uniform(5, 15))
+                # Strategy 2: Add random delay (from the jitter budget) to avoid rate limiting
+                self.jitter.sleep(*settings.NAVIGATION_RETRY_JITTER_SECONDS)
                 
                 # Strategy 3: Try different user agent
                 if attempt == 1:
@@ -123,7 +271,7 @@ class WeiboScraper:
                     driver.get(url)
                 
                 # Wait for page to load
-                time.sleep(3)
+                wait_for_document_ready(driver, settings.PAGE_READY_TIMEOUT_SECONDS)
                 
                 # Check if we're still in an error page
                 current_url = driver.current_url
@@ -133,7 +281,7 @@ class WeiboScraper:
                     
             except Exception as e:
                 logger.warning(f"Navigation retry {attempt + 1} failed: {e}")
-                time.sleep(2)
+                self.jitter.sleep(*settings.NAVIGATION_RETRY_JITTER_SECONDS)
         
         logger.error(f"Failed to navigate to {url} after {max_retries} attempts")
         return False
@@ -141,9 +289,11 @@ class WeiboScraper:
     def _is_error_page(self, driver) -> bool:
         """Check if current page is an error page"""
         try:
-            current_url = driver.current_url
-            page_source = driver.page_source.lower()
-            
+            # Evaluated in the page so the full page_source never crosses WebDriver
+            state = probe_page_state(driver)
+            current_url = str(state.get('url', '')).lower()
+            page_length = int(state.get('length') or 0)
+
             # Check for various error indicators
             error_indicators = [
                 'neterror',
@@ -152,27 +302,23 @@ class WeiboScraper:
                 '无法访问',
                 'redirect loop'
             ]
-            
+
             # Check for actual error pages (not just pages with "about:" text)
-            for indicator in error_indicators:
-                if indicator in current_url.lower() or indicator in page_source:
-                    return True
-            
+            if state.get('error') or any(indicator in current_url for indicator in error_indicators):
+                return True
+
             # Check for "about:" only if it's in the URL (not in page content)
-            if 'about:' in current_url.lower():
+            if 'about:' in current_url:
                 return True
-            
+
             # Check if page has meaningful content (not an error page)
-            if len(page_source) < 1000:  # Very short pages are likely error pages
+            if page_length < 1000:  # Very short pages are likely error pages
                 return True
-            
+
             # Check if we can find Weibo-specific content
-            weibo_indicators = ['weibo', '微博', 'feed', 'card', 'profile']
-            has_weibo_content = any(indicator in page_source for indicator in weibo_indicators)
-            
-            if not has_weibo_content and len(page_source) < 5000:
+            if not state.get('weibo') and page_length < 5000:
                 return True
-                    
+
             return False
         except Exception:
             return True
@@ -200,7 +346,7 @@ class WeiboScraper:
                     try:
                         logger.info(f"Trying alternative URL: {test_url}")
                         driver.get(test_url)
-                        time.sleep(5)
+                        wait_for_document_ready(driver, settings.PAGE_READY_TIMEOUT_SECONDS)
                         
                         current_url = driver.current_url
                         if 'neterror' not in current_url and 'about:' not in current_url:
@@ -216,14 +362,68 @@ class WeiboScraper:
                 
         return False
 
+    def _save_captured_json(self, raw: str, endpoints: Dict[str, Any], uid: str):
+        try:
+            out_dir = Path('weibo_tmp')
+            out_dir.mkdir(exist_ok=True)
+            account_name = endpoints.get('account_name') or f"uid{uid}"
+            # sanitize account name for filesystem safety
+            safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', str(account_name))
+            tz_gmt8 = pytz.timezone('Asia/Shanghai')
+            timestamp = datetime.now(tz_gmt8).strftime('%Y%m%d_%H%M%S')
+            out_path = out_dir / f"{safe_name}_{timestamp}.json"
+            out_path.write_text(raw, encoding='utf-8')
+            logger.info(f'Captured JSON saved to {out_path}')
+        except Exception as e:
+            logger.warning(f'Failed to save captured JSON: {e}')
+
     def get_weibo_content_once(self, endpoints: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
         self.rate_limiter.wait_if_needed()
-        if not self._is_driver_alive():
-            self._recreate_driver()
-            
         method = settings.EXTRACTION_METHOD
         main_url = endpoints.get('read_link_url', '')
-        
+
+        if method == 'http_api':
+            uid = self._extract_uid_from_url(main_url)
+            if not uid:
+                logger.error('Cannot derive uid from read_link_url for http_api method')
+                return None
+            raw = extract_http_api_json(self.api_client, uid, self._get_driver,
+                                        wait_before_ms=settings.AJAX_WAIT_MS,
+                                        max_refreshes=settings.HTTP_API_MAX_COOKIE_REFRESHES,
+                                        release_driver=self._release_driver)
+            if not raw:
+                logger.error('HTTP API returned empty or no JSON')
+                return None
+            self._save_captured_json(raw, endpoints, uid)
+            lst = to_list_from_ajax_json(raw)
+            if not lst:
+                logger.error('HTTP API JSON could not be parsed into list')
+                return None
+            return lst
+
+        if not self._is_driver_alive():
+            self._recreate_driver()
+        self.recycler.record_scan()
+        # Keep chromedriver's performance log from growing between scans
+        drain_performance_log(self.driver)
+
+        if method == 'network_capture':
+            uid = self._extract_uid_from_url(main_url)
+            if not uid:
+                logger.error('Cannot derive uid from read_link_url for network_capture method')
+                return None
+            raw = extract_network_capture_json(self.driver, uid, timeout_ms=settings.NETWORK_CAPTURE_TIMEOUT_MS)
+            self.resident_page.invalidate()
+            if not raw or not raw.strip():
+                logger.error('Network capture returned empty or no JSON')
+                return None
+            self._save_captured_json(raw, endpoints, uid)
+            lst = to_list_from_ajax_json(raw)
+            if not lst:
+                logger.error('Captured JSON could not be parsed into list')
+                return None
+            return lst
+
         if method == 'ajax_json':
             uid = self._extract_uid_from_url(main_url)
             if not uid:
@@ -234,23 +434,14 @@ class WeiboScraper:
             # extract_ajax_json handles navigation to mobile site internally
             logger.info(f"Using mobile API for UID: {uid}")
 
-            raw = extract_ajax_json(self.driver, main_url, uid, wait_before_ms=settings.AJAX_WAIT_MS)
+            if settings.AJAX_RESIDENT_PAGE:
+                raw = self.resident_page.fetch(self.driver, uid)
+            else:
+                raw = extract_ajax_json(self.driver, main_url, uid, wait_before_ms=settings.AJAX_WAIT_MS)
             if not raw or not raw.strip():
                 logger.error('AJAX capture returned empty or no JSON')
                 return None
-            try:
-                out_dir = Path('weibo_tmp')
-                out_dir.mkdir(exist_ok=True)
-                account_name = endpoints.get('account_name') or f"uid{uid}"
-                # sanitize account name for filesystem safety
-                safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', str(account_name))
-                tz_gmt8 = pytz.timezone('Asia/Shanghai')
-                timestamp = datetime.now(tz_gmt8).strftime('%Y%m%d_%H%M%S')
-                out_path = out_dir / f"{safe_name}_{timestamp}.json"
-                out_path.write_text(raw, encoding='utf-8')
-                logger.info(f'Captured JSON saved to {out_path}')
-            except Exception as e:
-                logger.warning(f'Failed to save captured JSON: {e}')
+            self._save_captured_json(raw, endpoints, uid)
             lst = to_list_from_ajax_json(raw)
             if not lst:
                 logger.error('AJAX JSON could not be parsed into list')
@@ -273,26 +464,45 @@ class WeiboScraper:
                     logger.error(f"Failed to navigate to mobile URL: {mobile_url}")
                     return None
                 
-            return extract_mobile_dom_as_list(self.driver, mobile_url, max_scrolls=8)
+            return extract_mobile_dom_as_list(self.driver, mobile_url, max_scrolls=8,
+                                              known_ids=self.db_manager.get_existing_ids)
 
         logger.error(f'Unknown extraction method: {method}')
         return None
 
-    def _rotate_session(self):
-        """Rotate the current session to avoid detection"""
+    def _rotate_session(self, wipe: bool = False):
+        """Rotate the current session to avoid detection
+
+        A light rotation restarts the browser from the persisted session; only
+        wipe=True throws the stored cookies and profile away.
+        """
         try:
-            logger.info("Rotating session to avoid detection...")
-            
-            # Clear all browser data
-            self.driver.delete_all_cookies()
-            self.driver.execute_script("window.localStorage.clear();")
-            self.driver.execute_script("window.sessionStorage.clear();")
-            
-            # Add random delay to simulate human behavior
-            time.sleep(random.uniform(2, 8))
-            
-            # Recreate driver with fresh session
-            self._recreate_driver()
+            logger.info(f"Rotating session to avoid detection (wipe={wipe})...")
+
+            # Reset the HTTP API cookies; they are re-minted on the next fetch if wiped
+            self.api_client.session.cookies.clear()
+            if not wipe:
+                self.api_client.load_cookies(self.session_store.load())
+            elif self.driver is None:
+                self.session_store.wipe()
+            if self.driver is None:
+                logger.info("Session rotation completed (no browser running)")
+                return
+
+            if settings.SESSION_ROTATION_MODE == 'context' and self._rotate_browser_context(wipe):
+                return
+
+            if wipe:
+                # Clear all browser data
+                self.driver.delete_all_cookies()
+                self.driver.execute_script("window.localStorage.clear();")
+                self.driver.execute_script("window.sessionStorage.clear();")
+
+            # Add random delay (from the jitter budget) to simulate human behavior
+            self.jitter.sleep(*settings.HUMAN_DELAY_SECONDS)
+
+            # Recreate driver (fresh session only when wiping)
+            self._recreate_driver(wipe_session=wipe)
             
             # Set random viewport size to appear more human
             viewport_sizes = [
@@ -307,98 +517,252 @@ class WeiboScraper:
         except Exception as e:
             logger.warning(f"Error during session rotation: {e}")
 
+    def _rotate_browser_context(self, wipe: bool) -> bool:
+        """Move to a fresh browser context instead of restarting Chrome"""
+        viewport_sizes = [
+            (1920, 1080), (1366, 768), (1440, 900),
+            (1536, 864), (1280, 720), (1600, 900)
+        ]
+        started = time.monotonic()
+        try:
+            old_context_id = self.browser_context_id
+            self.browser_context_id = WebDriverManager.open_browser_context(
+                self.driver, viewport=random.choice(viewport_sizes),
+                lean=settings.EXTRACTION_METHOD in settings.LEAN_BROWSER_METHODS)
+            WebDriverManager.dispose_browser_context(self.driver, old_context_id)
+        except Exception as e:
+            logger.warning(f"Browser context rotation failed, falling back to restart: {e}")
+            return False
+        self.resident_page.invalidate()
+        self.tab_pool.reset(self.driver)
+        if wipe:
+            self.session_store.wipe()
+        else:
+            self.session_store.load_into_driver(self.driver)
+        logger.info(f"Session rotation completed via new browser context in {(time.monotonic() - started) * 1000:.0f}ms")
+        return True
+
     def _add_human_like_delays(self):
-        """Add random delays to simulate human behavior"""
-        # Random delay between 1-5 seconds
-        delay = random.uniform(1, 5)
-        time.sleep(delay)
+        """Add random delays to simulate human behavior (bounded by the cycle's jitter budget)"""
+        self.jitter.sleep(*settings.HUMAN_DELAY_SECONDS)
 
     def get_weibo_content_loop(self, endpoints: Dict[str, str]) -> Optional[List[Dict[str, Any]]]:
-        max_retries = 10
-        retry_count = 0
+        """Fetch posts with a couple of quick attempts.
+
+        Longer backoff is the scheduler's job: a failed account is re-queued
+        instead of sleeping here and holding up every other account.
+        """
+        max_attempts = settings.FETCH_ATTEMPTS_PER_RUN
         account_name = endpoints.get('account_name', 'unknown')
+        # Failures from earlier runs count towards wiping the session
+        with self._failures_lock:
+            prior_failures = self.account_failures.get(account_name, 0)
         logger.info(f'Getting Weibo content for {account_name}... @ {datetime.now()}')
-        
-        while retry_count < max_retries:
+
+        for attempt in range(1, max_attempts + 1):
+            wipe = prior_failures + attempt >= settings.SESSION_WIPE_AFTER_FAILURES
             try:
                 # Add human-like delays
                 self._add_human_like_delays()
-                
+
                 content = self.get_weibo_content_once(endpoints)
                 if content:
                     logger.info(f'Successfully retrieved {len(content)} posts for {account_name}')
+                    self._save_session()
                     return content
-                    
-                retry_count += 1
-                if retry_count < max_retries:
-                    # Progressive backoff with jitter
-                    base_delay = min(90 * (2 ** (retry_count - 1)), 300)  # Max 5 minutes
-                    jitter = random.uniform(0.8, 1.2)
-                    delay = base_delay * jitter
-                    logger.warning(f'Retrying {account_name} in {delay:.1f}s... ({retry_count}/{max_retries})')
-                    time.sleep(delay)
-                    
-                    # For redirect loop errors, try recreating the driver
-                    if retry_count % 3 == 0:
-                        logger.info(f'Recreating driver for {account_name} due to repeated failures')
-                        self._recreate_driver()
-                        
-                    # Rotate session every few retries to avoid detection
-                    if retry_count % 2 == 0:
-                        self._rotate_session()
-                        
+
+                logger.warning(f'No content for {account_name} (attempt {attempt}/{max_attempts})')
+                if attempt < max_attempts:
+                    # Rotate session to avoid detection before the next attempt
+                    self._rotate_session(wipe=wipe)
+
             except Exception as e:
-                retry_count += 1
-                logger.error(f'Error getting content for {account_name} (attempt {retry_count}/{max_retries}): {e}')
-                
-                if retry_count < max_retries:
-                    # Shorter delay for exceptions
-                    delay = min(30 * retry_count, 120)
-                    logger.warning(f'Retrying {account_name} in {delay}s after exception...')
-                    time.sleep(delay)
-                    
-                    # Always recreate driver after exceptions
-                    self._recreate_driver()
-                    
-                    # Rotate session after exceptions
-                    self._rotate_session()
-                    
-        logger.error(f'Failed to get content for {account_name} after {max_retries} attempts')
+                logger.error(f'Error getting content for {account_name} (attempt {attempt}/{max_attempts}): {e}')
+
+                if attempt < max_attempts:
+                    # Always recreate driver after exceptions (if one is running)
+                    if self.driver is not None:
+                        self._recreate_driver()
+                    self._rotate_session(wipe=wipe)
+
+        logger.error(f'Failed to get content for {account_name} after {max_attempts} attempts')
         return None
 
-    def scan(self, endpoints: Dict[str, str]):
-        content = self.get_weibo_content_loop(endpoints)
+    def _iter_prefetched(self, accounts: List[Dict[str, Any]]):
+        """Yield (endpoints, posts) for accounts fetched through the tab pool or batch script.
+
+        Only used with ajax_json; the tab pool (TAB_POOL_SIZE > 1) yields each
+        account as soon as its tab finishes, the batch script per chunk.
+        Accounts that are never yielded fall back to the per-account loop.
+        """
+        if settings.EXTRACTION_METHOD != 'ajax_json' or len(accounts) < 2:
+            return
+        if settings.TAB_POOL_SIZE <= 1 and settings.AJAX_BATCH_SIZE <= 1:
+            return
+        by_uid: Dict[str, List[Dict[str, Any]]] = {}
+        for endpoints in accounts:
+            uid = self._extract_uid_from_url(endpoints.get('read_link_url', ''))
+            if uid:
+                by_uid.setdefault(uid, []).append(endpoints)
+        if not self._is_driver_alive():
+            self._recreate_driver()
+        drain_performance_log(self.driver)
+        fetched = 0
+        for uid, raw in self._iter_raw_prefetched(list(by_uid)):
+            # Each account fetched counts toward DRIVER_MAX_SCANS, as in get_weibo_content_once
+            self.recycler.record_scan()
+            if not raw:
+                continue
+            for endpoints in by_uid.get(uid, []):
+                self._save_captured_json(raw, endpoints, uid)
+                lst = to_list_from_ajax_json(raw)
+                if lst:
+                    fetched += 1
+                    yield endpoints, lst
+        if fetched:
+            logger.info(f'Prefetched {fetched}/{len(accounts)} accounts')
+            self._save_session()
+
+    def _iter_raw_prefetched(self, uids: List[str]):
+        if settings.TAB_POOL_SIZE > 1:
+            def before_start(n: int):
+                # One rate-limiter slot per fetch about to start
+                self.rate_limiter.wait_if_needed(n)
+
+            yield from self.tab_pool.iter_fetch(self.driver, uids, before_start=before_start)
+            return
+        for start in range(0, len(uids), settings.AJAX_BATCH_SIZE):
+            chunk = uids[start:start + settings.AJAX_BATCH_SIZE]
+            try:
+                # Every account in the chunk is its own getIndex request to m.weibo.cn
+                self.rate_limiter.wait_if_needed(len(chunk))
+                if not self._is_driver_alive():
+                    self._recreate_driver()
+                results = self.resident_page.fetch_batch(self.driver, chunk, concurrency=settings.AJAX_BATCH_CONCURRENCY,
+                                                         timeout_ms=settings.REQUEST_TIMEOUT_SECONDS * 1000,
+                                                         before_retry=self.rate_limiter.wait_if_needed)
+            except Exception as e:
+                logger.warning(f'Batch fetch failed for {len(chunk)} accounts: {e}')
+                continue
+            yield from results.items()
+
+    def scan(self, endpoints: Dict[str, Any], content: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Queue new items of one feed for every destination; returns False if its posts could not be fetched.
+
+        Each post is rendered once, then addressed to every (account, webhook)
+        that follows the feed and has not had it yet.
+        """
+        if content is None:
+            content = self.get_weibo_content_loop(endpoints)
         if not content:
             logger.warning('Failed to get content')
-            return
-        processed_count = 0
+            return False
+        destinations = self._destinations(endpoints)
+        accounts = list(dict.fromkeys(d['account_name'] for d in destinations))
+        page_ids = [i for i in (item.get('id') for item in content) if isinstance(i, int) and i > 0]
+        new_ids = {account: self.db_manager.filter_new_ids(page_ids, account=account) for account in accounts}
+        wanted = set().union(*new_ids.values())
+        rows: List[tuple] = []
+        retained: List[Path] = []
+        queued: Dict[str, Dict[int, Optional[float]]] = {account: {} for account in accounts}
         for item in reversed(content):
+            item_id = item.get('id')
+            if not item_id:
+                logger.warning(f"Item missing ID field: {item.get('text_raw', '')[:50]}...")
+                continue
+            if item_id not in wanted:
+                logger.debug(f"Item ID {item_id} already processed, skipping")
+                continue
             try:
-                item_id = item.get('id')
-                if item_id:
-                    logger.debug(f"Checking item ID: {item_id} (type: {type(item_id)})")
-                    if self.db_manager.check_and_add_id(item_id):
-                        logger.info(f"Processing new item ID: {item_id}")
-                        self.parse_item(item, endpoints)
-                        processed_count += 1
-                        time.sleep(10)
-                    else:
-                        logger.debug(f"Item ID {item_id} already processed, skipping")
-                else:
-                    logger.warning(f"Item missing ID field: {item.get('text_raw', '')[:50]}...")
+                logger.info(f"Processing new item ID: {item_id}")
+                messages = self.render_item(item, endpoints)
             except Exception as e:
-                logger.error(f"Error processing item {item.get('id', 'unknown')}: {e}")
-        if processed_count > 0:
-            logger.info(f'Processed {processed_count} new posts')
+                logger.error(f"Error processing item {item_id}: {e}")
+                continue
+            try:
+                posted = self._post_timestamp(item)
+                for destination in destinations:
+                    account = destination['account_name']
+                    if item_id not in new_ids[account] or not messages:
+                        continue
+                    for m in messages:
+                        addressed = self._address(m, destination)
+                        retained.extend(addressed['files'])
+                        rows.append((item_id, account, addressed['webhook_url'],
+                                     json.dumps(addressed['payload'], default=str, ensure_ascii=False),
+                                     json.dumps([str(p) for p in addressed['files']]), posted))
+                    queued[account][item_id] = posted
+            except Exception as e:
+                logger.error(f"Error addressing item {item_id}: {e}")
+            finally:
+                # Every destination holds its own copy of the attachments
+                self.image_manager.release([p for m in messages for p in m['files']])
+        # Posts are marked processed by the delivery worker once Discord accepts them
+        if rows and not self.db_manager.enqueue_outbox(rows):
+            self.image_manager.release(retained)
+            queued = {account: {} for account in accounts}
+        for account in accounts:
+            # The watermark may pass a post only once it is safely in the outbox;
+            # otherwise stop just below the oldest one so it is looked up again
+            failed = new_ids[account].difference(queued[account])
+            watermark = min(failed) - 1 if failed else max(page_ids, default=None)
+            self.db_manager.mark_processed([], account=account, watermark=watermark)
+        posts = {item_id: posted for q in queued.values() for item_id, posted in q.items()}
+        if posts:
+            self.delivery.wake()
+            logger.info(f'Queued {len(posts)} new posts for delivery to {len(destinations)} destination(s)')
         else:
             logger.info('No new posts found - all posts already processed')
+        try:
+            self.cadence.observe(endpoints.get('account_name', 'unknown'), filter(None, posts.values()),
+                                 filter(None, (self._post_timestamp(item) for item in content)))
+        except Exception as e:
+            logger.warning(f"Failed to update posting cadence: {e}")
+        return True
+
+    def _post_timestamp(self, item: Dict[str, Any]) -> Optional[float]:
+        dt = parse_created_at(item.get('created_at'))
+        return dt.timestamp() if dt else None
+
+    def _poll_interval(self, endpoints: Dict[str, Any]) -> float:
+        """Seconds until the account's next poll, learned from its posting cadence within its bounds"""
+        hot = bool(endpoints.get('hot', False))
+        low = float(endpoints.get('poll_min_minutes', settings.HOT_POLL_MIN_MINUTES if hot else settings.POLL_MIN_MINUTES)) * 60
+        high = max(low, float(endpoints.get('poll_max_minutes', settings.HOT_POLL_MAX_MINUTES if hot else settings.POLL_MAX_MINUTES)) * 60)
+        default = settings.SCAN_INTERVAL_MINUTES * 60
+        if not settings.ADAPTIVE_POLLING:
+            return min(high, max(low, default))
+        return self.cadence.interval(endpoints.get('account_name', 'unknown'), (low, high), default)
+
+    def _message(self, embed: Optional[DiscordEmbed] = None, files: Optional[List[Path]] = None) -> Dict[str, Any]:
+        """A rendered Discord message, not yet addressed; attachments are retained until released"""
+        payload: Dict[str, Any] = {}
+        if embed is not None:
+            payload['embeds'] = [embed_payload(embed)]
+        return {'payload': payload, 'files': self.image_manager.retain(files or [])}
 
-    def create_webhook_instance(self, endpoints: Dict[str, str], **kwargs) -> DiscordWebhook:
-        webhook_url = endpoints.get('message_webhook')
-        if not webhook_url or not webhook_url.startswith('https://discord.com/api/webhooks/'):
-            raise ValueError('Invalid Discord webhook URL')
-        avatar_url = endpoints.get('avatar_url')
-        return DiscordWebhook(url=webhook_url, avatar_url=avatar_url, **kwargs)
+    def _address(self, message: Dict[str, Any], destination: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a rendered message for one destination, with its title, avatar and own attachments"""
+        payload = copy.deepcopy(message['payload'])
+        payload['avatar_url'] = destination.get('avatar_url')
+        if payload.get('embeds'):
+            payload['embeds'][0]['title'] = destination.get('title', 'Weibo Post')
+        return {'webhook_url': destination['message_webhook'], 'payload': payload,
+                'files': self.image_manager.retain(message['files'])}
+
+    def _destinations(self, endpoints: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Every (account, webhook) a feed delivers to"""
+        destinations = []
+        for subscriber in endpoints.get('subscribers') or [endpoints]:
+            webhooks = subscriber.get('message_webhook')
+            for url in [webhooks] if isinstance(webhooks, str) else webhooks or []:
+                if not url.startswith('https://discord.com/api/webhooks/'):
+                    logger.error(f"Invalid Discord webhook URL for account {subscriber.get('account_name')}")
+                    continue
+                destinations.append({'account_name': subscriber.get('account_name'), 'message_webhook': url,
+                                     'title': subscriber.get('title', 'Weibo Post'),
+                                     'avatar_url': subscriber.get('avatar_url')})
+        return destinations
 
     def _load_kawaii_content(self):
         try:
@@ -416,38 +780,9 @@ class WeiboScraper:
         title = endpoints.get('title', 'Weibo Post')
         source = item.get('source', 'Unknown')
         embed_color = 16738740
-        s = str(created_at).strip()
-        now = datetime.now()
-        dt = None
-        try:
-            dt = datetime.strptime(s, '%a %b %d %H:%M:%S %z %Y')
-        except (ValueError, TypeError):
-            dt = None
-        if dt is None:
-            m = re.match(r'^(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})$', s)
-            if m:
-                month, day, hh, mm = map(int, m.groups())
-                dt = now.replace(month=month, day=day, hour=hh, minute=mm, second=0, microsecond=0)
-        if dt is None:
-            for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
-                try:
-                    dt = datetime.strptime(s, fmt)
-                    break
-                except Exception:
-                    pass
+        dt = parse_created_at(created_at)
         if dt is None:
-            m = re.match(r'^昨天\s+(\d{1,2}):(\d{2})$', s)
-            if m:
-                hh, mm = map(int, m.groups())
-                dt = (now.replace(hour=hh, minute=mm, second=0, microsecond=0))
-                dt = dt.replace(day=now.day) - timedelta(days=1)
-            else:
-                m = re.match(r'^今天\s+(\d{1,2}):(\d{2})$', s)
-                if m:
-                    hh, mm = map(int, m.groups())
-                    dt = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
-        if dt is None:
-            dt = now
+            dt = datetime.now()
         discord_timestamp = dt.timestamp()
         # Always use desktop detail URL for the post
         post_url = endpoints.get('read_link_url', '')
@@ -464,81 +799,173 @@ class WeiboScraper:
             embed.set_timestamp()
         return embed
 
-    def parse_item_text_only(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> int:
-        webhook_message = self.create_webhook_instance(endpoints)
-        webhook_message.add_embed(embed)
-        response = webhook_message.execute()
-        return response.status_code
+    def render_item_text_only(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [self._message(embed)]
 
-    def parse_item(self, item: Dict[str, Any], endpoints: Dict[str, str]) -> int:
+    def render_item(self, item: Dict[str, Any], endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Turn a post into the Discord messages that deliver it"""
         embed = self._create_base_embed(item, endpoints)
         if 'retweeted_status' in item:
-            return self.parse_item_retweet(item, embed, endpoints)
+            return self.render_item_retweet(item, embed, endpoints)
         if 'pic_infos' in item:
-            return self.parse_item_with_images(item, embed, endpoints)
+            return self.render_item_with_images(item, embed, endpoints)
         if 'page_info' in item:
             if 'media_info' in item['page_info']:
-                return self.parse_item_with_video(item, embed, endpoints)
+                return self.render_item_with_video(item, embed, endpoints)
             if 'page_pic' in item['page_info']:
-                return self.parse_item_with_page_pic(item, embed, endpoints)
+                return self.render_item_with_page_pic(item, embed, endpoints)
             debug_dir = Path('weibo_tmp')
             debug_dir.mkdir(exist_ok=True)
             debug_file = debug_dir / f'debug_{str(uuid.uuid4())[-10:]}.json'
             debug_file.write_text(json.dumps(item, indent=2, ensure_ascii=False), encoding='utf-8')
             logger.warning(f'Unknown page_info structure logged to {debug_file}')
-            return self.parse_item_text_only(item, embed, endpoints)
-        return self.parse_item_text_only(item, embed, endpoints)
+            return self.render_item_text_only(item, embed, endpoints)
+        return self.render_item_text_only(item, embed, endpoints)
 
     def start(self):
         logger.info("Starting Weibo scraper...")
         try:
-            for account in self.account_names:
-                try:
-                    endpoints = self.config['weibo'][account].copy()
-                    endpoints['account_name'] = account
-                    
-                    # Check if account is disabled
-                    if endpoints.get('disabled', False):
-                        disabled_reason = endpoints.get('disabled_reason', 'No reason specified')
-                        logger.info(f"Skipping disabled account {account}: {disabled_reason}")
-                        continue
-                        
-                    self.scan(endpoints)
-                except Exception as e:
-                    logger.error(f"Error scanning account {account}: {e}")
-            schedule.every(15).minutes.do(self._scan_all_accounts)
-            schedule.every(6).hours.do(self.send_status, self.config['status']['message_webhook'])
-            schedule.every(24).hours.do(self._cleanup_old_data)
-            self.send_status(self.config['status']['message_webhook'])
+            self.scheduler.add_group('accounts', self._run_account_jobs)
+            for endpoints in self._feeds(self._enabled_accounts()):
+                self.scheduler.add_job(Job(f"account:{endpoints['account_name']}", self._poll_interval(endpoints),
+                                           group='accounts', payload=endpoints))
+            status_webhook = self.config['status']['message_webhook']
+            self.scheduler.add_job(Job('status', settings.STATUS_INTERVAL_HOURS * 3600,
+                                       fn=lambda: self.send_status(status_webhook) < 400))
+            cleanup_interval = settings.CLEANUP_INTERVAL_HOURS * 3600
+            self.scheduler.add_job(Job('cleanup', cleanup_interval, fn=self._cleanup_old_data), delay=cleanup_interval)
+            # Resume messages left in the outbox by a previous run
+            self.delivery.wake()
             logger.info("Scraper started. Press Ctrl+C to stop.")
-            while True:
-                schedule.run_pending()
-                time.sleep(1)
+            self.scheduler.run_forever()
         except KeyboardInterrupt:
             logger.info("\nStopping scraper...")
         except Exception as e:
             logger.error(f"Unexpected error in main loop: {e}")
 
-    def _scan_all_accounts(self):
+    def _enabled_accounts(self) -> List[Dict[str, Any]]:
+        accounts = []
         for account in self.account_names:
             try:
                 endpoints = self.config['weibo'][account].copy()
                 endpoints['account_name'] = account
-                
+
                 # Check if account is disabled
                 if endpoints.get('disabled', False):
                     disabled_reason = endpoints.get('disabled_reason', 'No reason specified')
                     logger.info(f"Skipping disabled account {account}: {disabled_reason}")
                     continue
-                    
-                self.scan(endpoints)
+
+                accounts.append(endpoints)
+            except Exception as e:
+                logger.error(f"Error loading account {account}: {e}")
+        return accounts
+
+    def _feeds(self, accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge accounts that follow the same UID into one feed that is fetched once.
+
+        A feed is its first account's endpoints plus 'subscribers' (every
+        account following the UID); it polls as often as its most eager
+        subscriber asks for.
+        """
+        feeds: Dict[str, Dict[str, Any]] = {}
+        for endpoints in accounts:
+            uid = self._extract_uid_from_url(endpoints.get('read_link_url', '')) or endpoints['account_name']
+            feed = feeds.get(uid)
+            if feed is None:
+                feeds[uid] = dict(endpoints, subscribers=[endpoints])
+                continue
+            feed['subscribers'].append(endpoints)
+            feed['hot'] = bool(feed.get('hot')) or bool(endpoints.get('hot'))
+            for key in ('poll_min_minutes', 'poll_max_minutes'):
+                if key in endpoints:
+                    feed[key] = min(feed.get(key, endpoints[key]), endpoints[key])
+        for feed in feeds.values():
+            if len(feed['subscribers']) > 1:
+                names = ', '.join(e['account_name'] for e in feed['subscribers'])
+                logger.info(f"Accounts {names} follow the same user; fetching it once as {feed['account_name']}")
+        return list(feeds.values())
+
+    def _run_account_jobs(self, jobs: List[Job]) -> Dict[str, bool]:
+        """Scheduler group handler: scan every due account in one pass"""
+        with self._failures_lock:
+            self.account_failures = {job.payload['account_name']: job.failures for job in jobs}
+        results = self._scan_all_accounts([job.payload for job in jobs])
+        for job in jobs:
+            if results.get(job.payload['account_name']):
+                job.interval = self._poll_interval(job.payload)
+                logger.debug(f"Next poll for {job.payload['account_name']} in {job.interval / 60:.1f} min")
+        return {job.name: results.get(job.payload['account_name'], False) for job in jobs}
+
+    def _scan_all_accounts(self, accounts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, bool]:
+        """Scan feeds (all enabled accounts by default); returns {feed account name: fetched}"""
+        for worker in self.driver_pool.workers if self.driver_pool is not None else [self.primary_worker]:
+            worker.jitter.reset()
+        if accounts is None:
+            accounts = self._feeds(self._enabled_accounts())
+        if self.driver_pool is not None:
+            return self._scan_with_pool(accounts)
+        results: Dict[str, bool] = {}
+        remaining = {endpoints['account_name']: endpoints for endpoints in accounts}
+        try:
+            # Prefetched accounts are processed as their results arrive
+            for endpoints, content in self._iter_prefetched(accounts):
+                account = endpoints['account_name']
+                if remaining.pop(account, None) is None:
+                    continue
+                try:
+                    results[account] = self.scan(endpoints, content=content)
+                except Exception as e:
+                    logger.error(f"Error scanning account {account}: {e}")
+                    results[account] = False
+        except Exception as e:
+            logger.error(f"Error prefetching accounts: {e}")
+        self._maybe_recycle_driver()
+        for account, endpoints in remaining.items():
+            try:
+                results[account] = self.scan(endpoints)
+            except Exception as e:
+                logger.error(f"Error scanning account {account}: {e}")
+                results[account] = False
+            self._maybe_recycle_driver()
+        return results
+
+    def _fetch_on_worker(self, worker: BrowserWorker, endpoints: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        with self._use_worker(worker):
+            content = self.get_weibo_content_loop(endpoints)
+            self._maybe_recycle_driver()
+            return content
+
+    def _restart_worker(self, worker: BrowserWorker):
+        with self._use_worker(worker):
+            self._recreate_driver()
+
+    def _scan_with_pool(self, accounts: List[Dict[str, Any]]) -> Dict[str, bool]:
+        """Fetch accounts on their pinned browser workers and post results as they arrive"""
+        self.driver_pool.resize(len(accounts))
+        self.driver_pool.health_check(self._restart_worker)
+        if not (self.warm_spare and self.warm_spare.launching):
+            spare = [self.warm_spare.driver] if self.warm_spare and self.warm_spare.driver else []
+            WebDriverManager.reap_orphans(self.driver_pool.live_drivers() + spare)
+        fetched = self.driver_pool.map_by_affinity(accounts, key=lambda e: e['account_name'], fn=self._fetch_on_worker)
+        results: Dict[str, bool] = {}
+        for endpoints, content in fetched:
+            account = endpoints['account_name']
+            results[account] = False
+            if not content:
+                logger.warning(f"Failed to get content for {account}")
+                continue
+            try:
+                results[account] = self.scan(endpoints, content=content)
             except Exception as e:
                 logger.error(f"Error scanning account {account}: {e}")
+        return results
 
     def _cleanup_old_data(self):
         try:
             if self.db_manager:
                 self.db_manager.cleanup_old_records(days=30)
+                self.db_manager.cleanup_outbox(days=settings.OUTBOX_RETENTION_DAYS)
             if self.image_manager:
                 self.image_manager.cleanup_all()
             logger.info("Periodic cleanup completed")
@@ -549,10 +976,27 @@ class WeiboScraper:
         logger.info("Starting cleanup...")
         try:
             if hasattr(self, 'driver') and self.driver:
-                self.driver.quit()
+                self._save_session()
+                WebDriverManager.quit_driver(self.driver)
                 logger.info("WebDriver closed")
+            if getattr(self, 'driver_pool', None):
+                self.driver_pool.close()
+            if getattr(self, 'warm_spare', None):
+                self.warm_spare.close()
         except Exception as e:
             logger.error(f"Error closing webdriver: {e}")
+        try:
+            if hasattr(self, 'api_client') and self.api_client:
+                self.api_client.close()
+        except Exception as e:
+            logger.error(f"Error closing HTTP API session: {e}")
+        try:
+            if getattr(self, 'delivery', None):
+                self.delivery.stop()
+            if getattr(self, 'discord', None):
+                self.discord.close()
+        except Exception as e:
+            logger.error(f"Error stopping delivery worker: {e}")
         try:
             if hasattr(self, 'db_manager') and self.db_manager:
                 self.db_manager.close()
@@ -560,14 +1004,23 @@ class WeiboScraper:
             logger.error(f"Error closing database: {e}")
         try:
             if hasattr(self, 'image_manager') and self.image_manager:
+                self.image_manager.close()
                 self.image_manager.cleanup_all()
         except Exception as e:
             logger.error(f"Error cleaning up images: {e}")
         logger.info("Cleanup completed.")
 
     def send_status(self, status_webhook_url: str) -> int:
+        logger.info(f"Driver startup timings: {WebDriverManager.startup_summary()}")
+        logger.info(f"Rate limiter stats: {bucket_stats()}")
+        logger.info(f"Learned posts per day: {self.cadence.summary()}")
+        logger.info(f"Database writer: {self.db_manager.metrics()}")
+        logger.info(f"Delivery outbox: {self.db_manager.outbox_counts()} "
+                    f"(delivered {self.delivery.delivered}, rejected {self.delivery.failed}, "
+                    f"packed calls {self.delivery.packed_calls} since start)")
+        logger.info(f"Discord client: {self.discord.stats()}")
+        logger.info(f"Image downloads: {self.image_manager.stats()}")
         try:
-            webhook_status = DiscordWebhook(url=status_webhook_url)
             embed_color = 16738740
             emoji = random.choice(self.kawaii_emojis)
             text = random.choice(self.kawaii_texts)
@@ -580,15 +1033,16 @@ class WeiboScraper:
             time_now = datetime.now(timezone).strftime('%Y-%m-%d %H:%M:%S %Z')
             embed = DiscordEmbed(title=title, description=f"{emoji} {text} @ {time_now} -- {machine_info}", color=embed_color)
             embed.set_timestamp()
-            webhook_status.add_embed(embed)
-            response = webhook_status.execute()
-            return response.status_code
+            result = self.discord.send(status_webhook_url, {'embeds': [embed_payload(embed)]},
+                                       retries=settings.DISCORD_SEND_RETRIES)
+            if not result.ok:
+                logger.warning(f"Status message was not delivered: {result.error}")
+            return result.status or 500
         except Exception as e:
             logger.error(f"Error sending status: {e}")
             return 500
 
-
-    def parse_item_with_page_pic(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> int:
+    def render_item_with_page_pic(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
         try:
             page_info = item.get('page_info') or {}
             page_pic = page_info.get('page_pic')
@@ -597,25 +1051,21 @@ class WeiboScraper:
             else:
                 image_url = page_pic
             if not image_url:
-                return self.parse_item_text_only(item, embed, endpoints)
+                return self.render_item_text_only(item, embed, endpoints)
             image_path = self.image_manager.download_image(image_url)
             if image_path:
-                webhook_message = self.create_webhook_instance(endpoints)
-                with image_path.open('rb') as f:
-                    webhook_message.add_file(file=f.read(), filename=image_path.name)
                 embed.set_image(url=f'attachment://{image_path.name}')
-                webhook_message.add_embed(embed)
-                response = webhook_message.execute()
+                messages = [self._message(embed, [image_path])]
                 if self.image_manager.should_delete_images:
                     self.image_manager.delete_images([image_path])
-                return response.status_code
+                return messages
             else:
-                return self.parse_item_text_only(item, embed, endpoints)
+                return self.render_item_text_only(item, embed, endpoints)
         except Exception as e:
             logger.error(f"Error processing page pic: {e}")
-            return self.parse_item_text_only(item, embed, endpoints)
+            return self.render_item_text_only(item, embed, endpoints)
 
-    def parse_item_with_images(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> int:
+    def render_item_with_images(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
         try:
             image_urls: List[str] = []
             for _, v in (item.get('pic_infos') or {}).items():
@@ -635,7 +1085,7 @@ class WeiboScraper:
                     image_urls.append(v['original']['url'])
             image_paths = self.image_manager.download_images(image_urls)
             if not image_paths:
-                return self.parse_item_text_only(item, embed, endpoints)
+                return self.render_item_text_only(item, embed, endpoints)
             compressed_paths: List[Path] = []
             for image_path in image_paths:
                 compressed_paths.append(self.compress_image(image_path, max_size_mb=settings.DISCORD_ATTACHMENT_MAX_MB))
@@ -646,39 +1096,35 @@ class WeiboScraper:
                     collage_path = combine_images(compressed_paths)
                 except Exception as e:
                     logger.error(f"Error creating image collage: {e}")
-                    return self.parse_item_text_only(item, embed, endpoints)
+                    return self.render_item_text_only(item, embed, endpoints)
             try:
                 file_size_mb = collage_path.stat().st_size / (1024 ** 2)
                 if file_size_mb > settings.DISCORD_ATTACHMENT_MAX_MB:
                     logger.warning(f"Image collage too large ({file_size_mb:.1f}MB), sending text-only")
-                    return self.parse_item_text_only(item, embed, endpoints)
+                    return self.render_item_text_only(item, embed, endpoints)
             except Exception as e:
                 logger.error(f"Error checking file size: {e}")
-                return self.parse_item_text_only(item, embed, endpoints)
-            webhook_message = self.create_webhook_instance(endpoints)
-            with collage_path.open("rb") as f:
-                webhook_message.add_file(file=f.read(), filename=collage_path.name)
+                return self.render_item_text_only(item, embed, endpoints)
             embed.set_image(url=f'attachment://{collage_path.name}')
-            webhook_message.add_embed(embed)
-            response = webhook_message.execute()
+            messages = [self._message(embed, [collage_path])]
             if len(image_paths) > 1:
                 try:
-                    time.sleep(1)
-                    self.send_animated_images(image_paths, endpoints)
+                    messages.extend(self.render_animated_images(image_paths, endpoints))
                 except Exception:
                     pass
             if self.image_manager.should_delete_images and compressed_paths:
                 self.image_manager.delete_images(compressed_paths)
                 if collage_path and collage_path not in compressed_paths:
                     self.image_manager.delete_images([collage_path])
-            return response.status_code
+            return messages
         except Exception as e:
             logger.error(f"Error processing images: {e}")
-            return self.parse_item_text_only(item, embed, endpoints)
+            return self.render_item_text_only(item, embed, endpoints)
 
-    def send_animated_images(self, image_paths: List[Path], endpoints: Dict[str, str]) -> int:
+    def render_animated_images(self, image_paths: List[Path], endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Follow-up message carrying the post's GIFs, which the collage flattens"""
         try:
-            gif_webhook = self.create_webhook_instance(endpoints)
+            gif_paths: List[Path] = []
             files_to_delete: List[Path] = []
             for image_path in image_paths:
                 if image_path.suffix.lower() == ".gif":
@@ -692,37 +1138,28 @@ class WeiboScraper:
                             logger.error(f"Error resizing GIF {image_path}: {e}")
                             break
                     if file_size_mb <= 3:
-                        with image_path.open("rb") as f:
-                            gif_webhook.add_file(file=f.read(), filename=image_path.name)
-            if getattr(gif_webhook, 'files', None):
-                response = gif_webhook.execute()
-                if self.image_manager.should_delete_images:
-                    self.image_manager.delete_images(files_to_delete)
-                return response.status_code
-            return 204
+                        gif_paths.append(image_path)
+            messages = [self._message(files=gif_paths)] if gif_paths else []
+            if self.image_manager.should_delete_images:
+                self.image_manager.delete_images(files_to_delete)
+            return messages
         except Exception as e:
-            logger.error(f"Error in send_animated_images: {e}")
-            return 500
+            logger.error(f"Error in render_animated_images: {e}")
+            return []
 
-    def parse_item_with_video(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> int:
-        try:
-            # Do not send the separate video URL to Discord due to Weibo restrictions.
-            # Only send the embed (with per-post URL) so users can click through.
-            webhook_message = self.create_webhook_instance(endpoints)
-            webhook_message.add_embed(embed)
-            response = webhook_message.execute()
-            return response.status_code
-        except Exception as e:
-            logger.error(f"Error processing video: {e}")
-            return self.parse_item_text_only(item, embed, endpoints)
+    def render_item_with_video(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
+        # Do not send the separate video URL to Discord due to Weibo restrictions.
+        # Only send the embed (with per-post URL) so users can click through.
+        return self.render_item_text_only(item, embed, endpoints)
 
-    def parse_item_retweet(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> int:
+    def render_item_retweet(self, item: Dict[str, Any], embed: DiscordEmbed, endpoints: Dict[str, str]) -> List[Dict[str, Any]]:
         try:
             retweeted_status = item.get('retweeted_status') or {}
             retweet_text = retweeted_status.get('text_raw') or retweeted_status.get('text') or ''
             user_name = ((retweeted_status.get('user') or {}).get('screen_name')) or '转发'
             image_paths: List[Path] = []
             collage_path: Optional[Path] = None
+            attachments: List[Path] = []
             if 'pic_infos' in retweeted_status:
                 image_urls: List[str] = []
                 for _, v in (retweeted_status.get('pic_infos') or {}).items():
@@ -756,33 +1193,22 @@ class WeiboScraper:
                 try:
                     file_size_mb = collage_path.stat().st_size / (1024 ** 2)
                     if file_size_mb <= 3:
-                        webhook_message = self.create_webhook_instance(endpoints)
-                        with collage_path.open("rb") as f:
-                            webhook_message.add_file(file=f.read(), filename=collage_path.name)
+                        attachments.append(collage_path)
                         embed.set_image(url=f'attachment://{collage_path.name}')
                     else:
                         logger.warning(f"Retweet image too large ({file_size_mb:.1f}MB), sending without image")
-                        webhook_message = self.create_webhook_instance(endpoints)
                 except Exception as e:
                     logger.error(f"Error processing retweet image: {e}")
-                    webhook_message = self.create_webhook_instance(endpoints)
-            else:
-                webhook_message = self.create_webhook_instance(endpoints)
             embed.add_embed_field(name=f"@{user_name}", value=retweet_text)
-            webhook_message.add_embed(embed)
-            try:
-                response = webhook_message.execute()
-                if self.image_manager.should_delete_images and image_paths:
-                    self.image_manager.delete_images(image_paths)
-                    if collage_path and collage_path not in image_paths:
-                        self.image_manager.delete_images([collage_path])
-                return response.status_code
-            except Exception as e:
-                logger.error(f"Error sending retweet: {e}")
-                return 500
+            messages = [self._message(embed, attachments)]
+            if self.image_manager.should_delete_images and image_paths:
+                self.image_manager.delete_images(image_paths)
+                if collage_path and collage_path not in image_paths:
+                    self.image_manager.delete_images([collage_path])
+            return messages
         except Exception as e:
             logger.error(f"Error processing retweet: {e}")
-            return self.parse_item_text_only(item, embed, endpoints)
+            return self.render_item_text_only(item, embed, endpoints)
 
     def compress_image(self, image_path: Path, max_size_mb: float = 5.0) -> Path:
         try:
@@ -113,6 +113,7 @@ def test_database():
     
     try:
         import sqlite3
+        from core import settings
         from core.database import DatabaseManager
         
         # Test database creation
@@ -136,8 +137,62 @@ def test_database():
             print("✗ Duplicate ID handling failed")
             return False
         
+        # Test batched lookup and marking
+        new_ids = db_manager.filter_new_ids([12345, 12346, 12347])
+        if new_ids == {12346, 12347} and db_manager.mark_processed(new_ids) == 2 and not db_manager.filter_new_ids(new_ids):
+            print("✓ Batched ID filter and mark operations successful")
+        else:
+            print("✗ Batched ID filter and mark operations failed")
+            return False
+        
+        # Test per-account watermark: the ids just below it are still looked up, older ones are not
+        db_manager.mark_processed([12348], account='test', watermark=12348)
+        expected = set(range(12349 - settings.WATERMARK_RECHECK_IDS, 12345)) | {12349}
+        if db_manager.filter_new_ids(range(12300, 12350), account='test') == expected:
+            print("✓ Account watermark filtering works correctly")
+        else:
+            print("✗ Account watermark filtering failed")
+            return False
+
+        # Test per-account deduplication (accounts following the same user)
+        db_manager.mark_processed([12350], account='test')
+        if db_manager.filter_new_ids([12350], account='other') == {12350} and not db_manager.filter_new_ids([12350], account='test'):
+            print("✓ Per-account deduplication works correctly")
+        else:
+            print("✗ Per-account deduplication failed")
+            return False
+
+        # Test upgrading a database created before versioned migrations
+        from core.migrations import MIGRATIONS, migrate
+        legacy = sqlite3.connect(':memory:')
+        legacy.execute('CREATE TABLE weibo (id INTEGER PRIMARY KEY, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        legacy.execute('INSERT INTO weibo (id) VALUES (42)')
+        legacy.commit()
+        version = migrate(legacy)
+        kept = legacy.execute('SELECT COUNT(*) FROM weibo WHERE id = 42').fetchone()[0]
+        if version == MIGRATIONS[-1][0] and migrate(legacy) == version and kept == 1:
+            print("✓ Legacy database migrated to the latest schema")
+        else:
+            print(f"✗ Legacy database migration failed (version {version})")
+            return False
+        legacy.close()
+
+        # Test concurrent writes through the writer thread
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            added = list(pool.map(db_manager.check_and_add_id, range(20000, 20050)))
+        if all(added) and db_manager.metrics()['queue_depth'] == 0:
+            print("✓ Concurrent writes committed through the writer thread")
+        else:
+            print("✗ Concurrent writes failed")
+            return False
+
         # Cleanup
         db_manager.close()
+        # Writes after the writer thread is gone fail instead of blocking
+        if db_manager.check_and_add_id(20050):
+            print("✗ Write after close did not fail")
+            return False
         Path('test.db').unlink(missing_ok=True)
         
         return True
@@ -145,6 +200,365 @@ def test_database():
         print(f"✗ Database test failed: {e}")
         return False
 
+def test_http_api():
+    """Test that the HTTP API only starts Chrome when the session is rejected."""
+    print("\nTesting HTTP API cookie refresh...")
+    
+    try:
+        import requests
+        from extractors.http_api_extractor import HttpApiClient, extract_http_api_json
+        
+        class FakeResponse:
+            def __init__(self, status_code, text=''):
+                self.status_code = status_code
+                self.text = text
+        
+        def fetch(responses, has_cookies=True):
+            client = HttpApiClient()
+            if has_cookies:
+                client.load_cookies([{'name': 'SUB', 'value': 'cookie', 'domain': '.weibo.cn'}])
+            events = []
+            
+            def get(*args, **kwargs):
+                response = responses.pop(0)
+                if isinstance(response, Exception):
+                    raise response
+                return response
+            
+            client.session.get = get
+            client.refresh_cookies = lambda driver, uid, wait_ms: events.append('refresh') or True
+            raw = extract_http_api_json(client, '123', lambda: events.append('driver'),
+                                        release_driver=lambda: events.append('release'))
+            return raw, events
+        
+        posts = '{"ok": 1, "data": {"cards": []}}'
+        if fetch([requests.RequestException('timeout')]) != (None, []) or fetch([FakeResponse(200, '{"ok": 0}')]) != (None, []):
+            print("✗ Network errors or empty accounts started the browser")
+            return False
+        print("✓ Network errors and empty accounts do not refresh cookies")
+        
+        expected = (posts, ['driver', 'refresh', 'release'])
+        if fetch([FakeResponse(432), FakeResponse(200, posts)]) != expected or fetch([FakeResponse(200, posts)], has_cookies=False) != expected:
+            print("✗ Rejected session was not refreshed through a released browser")
+            return False
+        print("✓ Rejected sessions refresh cookies and release the browser")
+        
+        return True
+    except Exception as e:
+        print(f"✗ HTTP API test failed: {e}")
+        return False
+
+def test_browser_workers():
+    """Test that pool workers keep their own session state."""
+    print("\nTesting browser workers...")
+    
+    try:
+        import threading
+        from services.driver_pool import BrowserWorker
+        from services.weibo_scraper import WeiboScraper
+        
+        first, second = BrowserWorker.build(0), BrowserWorker.build(1)
+        if first.jitter is second.jitter or first.rate_limiter is second.rate_limiter:
+            print("✗ Workers share a jitter budget or rate limiter")
+            return False
+        print("✓ Each worker has its own jitter budget and rate limiter")
+        
+        # Only the worker binding is needed, not a running scraper
+        scraper = WeiboScraper.__new__(WeiboScraper)
+        scraper._local = threading.local()
+        scraper.primary_worker = first
+        with scraper._use_worker(second):
+            with scraper._use_worker(first):
+                pass
+            restored = scraper.worker
+        if restored is second and scraper.worker is first:
+            print("✓ Nested worker bindings restore the previous worker")
+        else:
+            print("✗ Worker binding was not restored")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"✗ Browser worker test failed: {e}")
+        return False
+
+class _FakeClock:
+    """Stands in for the time module so timing tests run instantly"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_rate_limiter():
+    """Test GCRA token bucket delays."""
+    print("\nTesting rate limiter...")
+    
+    try:
+        import core.rate_limiter as rate_limiter
+        
+        clock = _FakeClock()
+        real_time = rate_limiter.time
+        rate_limiter.time = clock
+        try:
+            # 3 requests per 60s: a burst of 3, then one every 20s
+            limiter = rate_limiter.RateLimiter(3, 60)
+            delays = [limiter.wait_if_needed() for _ in range(5)]
+            # A batch of 3 waits until its last request's slot
+            batch_delay = limiter.wait_if_needed(3)
+        finally:
+            rate_limiter.time = real_time
+        
+        if delays == [0.0, 0.0, 0.0, 20.0, 20.0] and batch_delay == 60.0:
+            print("✓ Rate limiter delay sequence is correct")
+        else:
+            print(f"✗ Unexpected rate limiter delays: {delays}, batch {batch_delay}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"✗ Rate limiter test failed: {e}")
+        return False
+
+def test_scheduler():
+    """Test scheduler grouping, backoff and circuit breaker."""
+    print("\nTesting scheduler...")
+    
+    try:
+        import core.scheduler as scheduler_module
+        from core.scheduler import Scheduler, Job
+        
+        clock = _FakeClock()
+        real_time = scheduler_module.time
+        scheduler_module.time = clock
+        try:
+            scheduler = Scheduler(retry_base=10, retry_max=100, breaker_failures=3, breaker_cooldown=1000, group_window=60)
+            batches = []
+            scheduler.add_group('accounts', lambda jobs: batches.append(sorted(j.name for j in jobs)) or {j.name: True for j in jobs})
+            scheduler.add_job(Job('a', 300, group='accounts'))
+            scheduler.add_job(Job('b', 300, group='accounts'), delay=30)
+            scheduler.add_job(Job('c', 300, group='accounts'), delay=120)
+            scheduler.run_pending()
+            if batches != [['a', 'b']]:
+                print(f"✗ Group window batching failed: {batches}")
+                return False
+            print("✓ Jobs due within the group window run together")
+            
+            delays = []
+            failing = scheduler.add_job(Job('failing', 60, fn=lambda: False))
+            for _ in range(4):
+                clock.now = failing.next_run
+                scheduler.run_pending()
+                delays.append(failing.next_run - clock.now)
+        finally:
+            scheduler_module.time = real_time
+        
+        # Jittered exponential backoff (x0.8-1.2), then the breaker's cooldown
+        if 8 <= delays[0] <= 12 and 16 <= delays[1] <= 24 and all(abs(d - 1000) < 1e-6 for d in delays[2:]) and failing.circuit_open:
+            print("✓ Backoff and circuit breaker work correctly")
+        else:
+            print(f"✗ Unexpected retry delays: {delays}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"✗ Scheduler test failed: {e}")
+        return False
+
+def test_cadence():
+    """Test adaptive poll interval bounds."""
+    print("\nTesting adaptive polling...")
+    
+    try:
+        from core.cadence import AccountCadence, CadenceTracker
+        
+        class FakeDatabase:
+            def load_cadence(self):
+                return {}
+            
+            def save_cadence(self, *args):
+                pass
+        
+        tracker = CadenceTracker(FakeDatabase(), half_life_hours=24, posts_per_poll=0.5)
+        # Accounts with no history keep the plain scan interval, clamped to their bounds
+        if tracker.interval('new', (300, 7200), 900) != 900 or tracker.interval('new', (60, 180), 900) != 180:
+            print("✗ Unlearned account did not fall back to the scan interval")
+            return False
+        print("✓ Unlearned accounts poll at the scan interval")
+        
+        now = 1700000000.0
+        bounds = (300, 7200)
+        intervals = [AccountCadence(rate=rate, updated_at=now).poll_interval(now, bounds, 0.5, 0)
+                     for rate in (0.0, 1.0, 100.0)]
+        spread = AccountCadence(rate=1.0, updated_at=now).poll_interval(now, bounds, 0.5, 0.1)
+        if intervals == [7200, 1800, 300] and 1620 <= spread <= 1980:
+            print("✓ Learned intervals follow the posting rate within bounds")
+        else:
+            print(f"✗ Unexpected poll intervals: {intervals}, spread {spread}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"✗ Adaptive polling test failed: {e}")
+        return False
+
+def test_delivery_outbox():
+    """Test that transient delivery failures keep posts queued."""
+    print("\nTesting delivery outbox...")
+    
+    try:
+        import json
+        from core.database import DatabaseManager
+        from services.delivery import DeliveryWorker
+        from services.discord_client import SendResult
+        
+        class FakeClient:
+            result = SendResult(503, error='HTTP 503')
+            
+            def post(self, url, payload, files=None):
+                return self.result
+        
+        class FakeImages:
+            def release(self, paths):
+                pass
+        
+        Path('data').mkdir(exist_ok=True)
+        db_path = Path('data/test_outbox.db')
+        db_manager = DatabaseManager(str(db_path))
+        client = FakeClient()
+        worker = DeliveryWorker(db_manager, FakeImages(), client)
+        try:
+            db_manager.enqueue_outbox([(1, 'test', 'hook', json.dumps({'embeds': [{'title': 'post'}]}), '[]', None)])
+            row = db_manager.pending_outbox()[0]
+            # However long an outage lasts, the post stays queued
+            row['attempts'] = 100
+            if worker._deliver([row]) or db_manager.outbox_counts() != {'pending': 1}:
+                print("✗ Transient failure dropped the queued post")
+                return False
+            print("✓ Transient failures keep the post queued")
+            
+            client.result = SendResult(200)
+            if not worker._deliver(db_manager.pending_outbox()) or db_manager.outbox_counts() != {'delivered': 1}:
+                print("✗ Delivered post was not closed")
+                return False
+            print("✓ Delivered post is closed")
+        finally:
+            worker.stop()
+            db_manager.close()
+            for suffix in ('', '-wal', '-shm'):
+                Path(f'{db_path}{suffix}').unlink(missing_ok=True)
+        
+        return True
+    except Exception as e:
+        print(f"✗ Delivery outbox test failed: {e}")
+        return False
+
+def test_discord_rate_limits():
+    """Test parsing of Discord rate-limit headers."""
+    print("\nTesting Discord rate-limit tracking...")
+    
+    try:
+        from services.discord_client import DiscordClient
+        
+        class FakeResponse:
+            def __init__(self, status_code, headers, body=None):
+                self.status_code = status_code
+                self.headers = headers
+                self.body = body
+            
+            def json(self):
+                if self.body is None:
+                    raise ValueError('no body')
+                return self.body
+        
+        first = 'https://discord.com/api/webhooks/1/token'
+        second = 'https://discord.com/api/webhooks/2/token'
+        
+        client = DiscordClient()
+        client._update(first, FakeResponse(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '2'}))
+        if not 1.5 < client.wait_time(first) <= 2 or client.wait_time(second) != 0:
+            print("✗ Exhausted bucket not tracked from Reset-After")
+            return False
+        print("✓ X-RateLimit-Remaining / Reset-After tracked per webhook")
+        
+        client = DiscordClient()
+        retry_after = client._update(first, FakeResponse(429, {}, {'retry_after': 1.5, 'global': False}))
+        if retry_after != 1.5 or not 1 < client.wait_time(first) <= 1.5 or client.wait_time(second) != 0:
+            print("✗ Per-webhook 429 not handled")
+            return False
+        client._update(first, FakeResponse(429, {'Retry-After': '3', 'X-RateLimit-Scope': 'global'}))
+        if not 2.5 < client.wait_time(second) <= 3:
+            print("✗ Global 429 did not block other webhooks")
+            return False
+        print("✓ 429 Retry-After handled for one webhook and globally")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Discord rate-limit test failed: {e}")
+        return False
+
+def test_delivery_packing():
+    """Test packing of queued Discord messages."""
+    print("\nTesting delivery packing...")
+    
+    try:
+        import json
+        import tempfile
+        from services.delivery import DeliveryWorker
+        
+        worker = DeliveryWorker(None, None, None)
+        
+        def row(row_id, account='a', payload=None, files=()):
+            payload = payload or {'avatar_url': 'x', 'embeds': [{'title': f'post {row_id}'}]}
+            return {'id': row_id, 'weibo_id': row_id, 'account': account, 'webhook_url': 'hook', 'attempts': 0,
+                    'next_attempt_at': 0, 'payload': json.dumps(payload), 'files': json.dumps(list(files))}
+        
+        rows = [row(i) for i in range(12)]
+        if [r['id'] for r in worker._pack(rows[0], rows[1:], 0)] != list(range(10)):
+            print("✗ Packing did not stop at 10 embeds")
+            return False
+        if len(worker._pack(rows[0], [rows[1], row(99, account='b'), rows[2]], 0)) != 2:
+            print("✗ Packing crossed into another account")
+            return False
+        if len(worker._pack(rows[0], [row(98, payload={'content': 'plain'})], 0)) != 1:
+            print("✗ Non-embed message was packed")
+            return False
+        long_post = {'avatar_url': 'x', 'embeds': [{'title': 't', 'description': 'x' * 3500}]}
+        if len(worker._pack(row(1, payload=long_post), [row(2, payload=long_post)], 0)) != 1:
+            print("✗ Packing exceeded the 6000 character limit")
+            return False
+        print("✓ Packing respects embed, account and size limits")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for n in range(2):
+                path = Path(tmp) / str(n) / 'c.jpg'
+                path.parent.mkdir()
+                path.write_bytes(b'img')
+                paths.append(str(path))
+            image_post = {'avatar_url': 'x', 'embeds': [{'title': 't', 'image': {'url': 'attachment://c.jpg'}}]}
+            payload, files = worker._message([row(1, payload=image_post, files=[paths[0]]),
+                                              row(2, payload=image_post, files=[paths[1]])])
+        names = [name for name, _ in files]
+        images = [e['image']['url'] for e in payload['embeds']]
+        if names == ['c.jpg', '1_c.jpg'] and images == ['attachment://c.jpg', 'attachment://1_c.jpg']:
+            print("✓ Clashing attachment names are renamed in their embeds")
+        else:
+            print(f"✗ Attachment rename failed: {names} {images}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"✗ Delivery packing test failed: {e}")
+        return False
+
 def test_image_manager():
     """Test image manager functionality."""
     print("\nTesting image manager...")
@@ -165,7 +579,28 @@ def test_image_manager():
             print("✗ Image directory creation failed")
             return False
         
-        # Cleanup
+        # Test that rejected responses count as failed downloads
+        class FakeResponse:
+            status_code = 404
+            headers = {}
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *args):
+                pass
+        
+        session, _ = image_manager._host('wx1.sinaimg.cn')
+        session.get = lambda *args, **kwargs: FakeResponse()
+        if image_manager.download_image('https://wx1.sinaimg.cn/large/test.jpg') is None and image_manager.stats()['failures'] == 1:
+            print("✓ Rejected downloads are counted as failures")
+        else:
+            print("✗ Rejected download was not counted as a failure")
+            return False
+        image_manager.close()
+        
+        # Cleanup (the manager also creates the outbox attachment directory)
+        (test_dir / 'outbox').rmdir()
         test_dir.rmdir()
         
         return True
@@ -215,6 +650,14 @@ def main():
         test_config,
         test_kawaii_content,
         test_database,
+        test_http_api,
+        test_browser_workers,
+        test_rate_limiter,
+        test_scheduler,
+        test_cadence,
+        test_delivery_outbox,
+        test_discord_rate_limits,
+        test_delivery_packing,
         test_image_manager,
         test_webdriver_manager
     ]